@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from user.models import User
+from company.models import Company
+from experience.models import Experience
+from opportunity.models import Opportunity, Notification, UnreadNotificationCount
+from tag.models import Tag
+
+RECENT = timedelta(days=30)
+TRENDS = timedelta(days=180)
+
+
+def grouped(queryset, field, limit=None):
+    rows = queryset.values(field).annotate(count=Count('id')).order_by('-count', field)
+    return list(rows[:limit] if limit else rows)
+
+
+def by_month(queryset, field, since):
+    return list(
+        queryset.filter(**{f'{field}__gte': since})
+        .annotate(month=TruncMonth(field))
+        .values('month')
+        .annotate(count=Count('id'))
+        .order_by('month')
+    )
+
+
+def top_companies(related):
+    # related: the Company reverse relation to count
+    return list(
+        Company.objects.annotate(count=Count(related))
+        .filter(count__gt=0)
+        .order_by('-count', 'id')
+        .values('name', 'slug', 'count')[:5]
+    )
+
+
+def dashboard_queries(now):
+    # name -> callable running exactly one query. Every table is aggregated
+    # once, with Count(filter=...) for its sub-totals, and every distribution
+    # is one GROUP BY.
+    recent = now - RECENT
+    trends = now - TRENDS
+    return {
+        # Aggregates can't share a name with a model field (verified), hence _count.
+        # User has no join date, recent users are the ones who logged in recently
+        'users': lambda: User.objects.aggregate(
+            total=Count('id'),
+            recent_count=Count('id', filter=Q(last_login__gte=recent)),
+        ),
+        'experiences': lambda: Experience.objects.aggregate(
+            total=Count('id'),
+            verified_count=Count('id', filter=Q(verified=True)),
+            pending_count=Count('id', filter=Q(verified=False)),
+            recent_count=Count('id', filter=Q(published_date__gte=recent)),
+        ),
+        'opportunities': lambda: Opportunity.objects.aggregate(
+            total=Count('id'),
+            verified_count=Count('id', filter=Q(verified=True)),
+            pending_count=Count('id', filter=Q(verified=False)),
+            recent_count=Count('id', filter=Q(created_date__gte=recent)),
+        ),
+        'companies': lambda: Company.objects.aggregate(total=Count('id')),
+        'tags': lambda: Tag.objects.aggregate(total=Count('id')),
+        'notifications': lambda: Notification.objects.aggregate(total=Count('id')),
+        # Sum of the per-user counters, much smaller than the notification table
+        'unread': lambda: UnreadNotificationCount.objects.aggregate(total=Sum('count')),
+        'user_roles': lambda: grouped(User.objects.all(), 'role'),
+        'departments': lambda: grouped(
+            User.objects.exclude(department__isnull=True).exclude(department=''), 'department', limit=10
+        ),
+        'programmes': lambda: grouped(
+            User.objects.exclude(programme__isnull=True).exclude(programme=''), 'programme'
+        ),
+        'job_types': lambda: grouped(Experience.objects.all(), 'job_type'),
+        'opportunity_types': lambda: grouped(Opportunity.objects.all(), 'opportunity_type'),
+        'notification_types': lambda: grouped(Notification.objects.all(), 'notification_type'),
+        'experiences_by_month': lambda: by_month(Experience.objects.all(), 'published_date', trends),
+        'opportunities_by_month': lambda: by_month(Opportunity.objects.all(), 'created_date', trends),
+        'top_by_experiences': lambda: top_companies('experiences'),
+        'top_by_opportunities': lambda: top_companies('opportunities'),
+    }
+
+
+def _run_in_own_connection(query):
+    try:
+        return query()
+    finally:
+        # Pool threads each opened their own connection, don't leave it open
+        connection.close()
+
+
+def run_queries(queries, workers=None):
+    # Runs the queries one after the other, or with ANALYTICS_DASHBOARD_WORKERS
+    # > 1 that many at a time, each on its own database connection. Concurrent
+    # queries don't see uncommitted data of the calling thread (e.g. in tests).
+    if workers is None:
+        workers = getattr(settings, 'ANALYTICS_DASHBOARD_WORKERS', 1)
+    if workers <= 1:
+        return {name: query() for name, query in queries.items()}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard') as executor:
+        futures = {name: executor.submit(_run_in_own_connection, query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def rate(part, total):
+    return round(part / total * 100, 2) if total > 0 else 0
+
+
+def dashboard(now=None, workers=None):
+    results = run_queries(dashboard_queries(now or timezone.now()), workers=workers)
+    users = results['users']
+    experiences = results['experiences']
+    opportunities = results['opportunities']
+    return {
+        'overview': {
+            'total_users': users['total'],
+            'total_companies': results['companies']['total'],
+            'total_experiences': experiences['total'],
+            'total_opportunities': opportunities['total'],
+            'total_notifications': results['notifications']['total'],
+            'total_tags': results['tags']['total'],
+        },
+        'verification': {
+            'verified_experiences': experiences['verified_count'],
+            'pending_experiences': experiences['pending_count'],
+            'verified_opportunities': opportunities['verified_count'],
+            'pending_opportunities': opportunities['pending_count'],
+            'experience_verification_rate': rate(experiences['verified_count'], experiences['total']),
+            'opportunity_verification_rate': rate(opportunities['verified_count'], opportunities['total']),
+        },
+        'user_stats': {
+            'user_roles': results['user_roles'],
+            'department_distribution': results['departments'],
+            'program_distribution': results['programmes'],
+        },
+        'activity': {
+            'recent_experiences': experiences['recent_count'],
+            'recent_opportunities': opportunities['recent_count'],
+            'recent_users': users['recent_count'],
+        },
+        'companies': {
+            'top_by_experiences': results['top_by_experiences'],
+            'top_by_opportunities': results['top_by_opportunities'],
+        },
+        'trends': {
+            'experiences_by_month': results['experiences_by_month'],
+            'opportunities_by_month': results['opportunities_by_month'],
+        },
+        'content_types': {
+            'job_types': results['job_types'],
+            'opportunity_types': results['opportunity_types'],
+        },
+        'notifications': {
+            'unread_count': results['unread']['total'] or 0,
+            'types': results['notification_types'],
+        },
+    }
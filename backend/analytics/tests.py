@@ -0,0 +1,82 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from user.models import User
+from company.models import Company
+from experience.models import Experience
+from opportunity.models import Notification, Opportunity
+from tag.models import Tag
+from .dashboard import dashboard, dashboard_queries
+
+
+def add_content(count):
+    for i in range(count):
+        n = User.objects.count()
+        user = User.objects.create(
+            email=f'user{n}@nitc.ac.in', name='User', role='student' if i % 2 else 'pr',
+            department='CSE' if i % 3 else 'EE', programme='BTech',
+        )
+        company = Company.objects.create(name=f'Company {n}', slug=f'company-{n}', logo='', description='x')
+        Tag.objects.create(title=f'tag-{n}')
+        Experience.objects.create(
+            title=f'Experience {i}', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=user, company=company, verified=bool(i % 2),
+        )
+        Opportunity.objects.create(
+            title=f'Opportunity {i}', description='x', opportunity_type='job', company=company,
+            created_by=user, verified=not i % 2,
+        )
+        Notification.objects.create_many([Notification(user=user, title='x', message='x', notification_type='system')])
+
+
+class DashboardQueryBudgetTests(APITestCase):
+    # The dashboard is a fixed set of queries, one aggregate per table and one
+    # GROUP BY per distribution, however much data there is.
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@nitc.ac.in', name='Admin', role='admin')
+        self.client.force_authenticate(self.admin)
+
+    def get(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/analyticsdashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_query_count(self):
+        add_content(2)
+        _, few = self.get()
+        add_content(8)
+        response, many = self.get()
+        self.assertEqual(few, many)
+        self.assertEqual(many, len(dashboard_queries(timezone.now())))
+        self.assertEqual(many, 17)
+
+        overview = response.data['overview']
+        self.assertEqual(overview['total_users'], 11)
+        self.assertEqual(overview['total_experiences'], 10)
+        self.assertEqual(overview['total_notifications'], 10)
+        verification = response.data['verification']
+        self.assertEqual((verification['verified_experiences'], verification['pending_experiences']), (5, 5))
+        self.assertEqual(verification['opportunity_verification_rate'], 50.0)
+        self.assertEqual(response.data['activity']['recent_opportunities'], 10)
+        self.assertEqual(response.data['notifications']['unread_count'], 10)
+        self.assertEqual(len(response.data['companies']['top_by_experiences']), 5)
+
+    def test_students_forbidden(self):
+        student = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.get('/api/analyticsdashboard/').status_code, 403)
+
+
+class ConcurrentDashboardTests(TransactionTestCase):
+    # The worker threads use their own connections, so the data has to be committed
+
+    def test_same_as_sequential(self):
+        add_content(4)
+        self.assertEqual(dashboard(workers=4), dashboard(workers=1))
@@ -0,0 +1,33 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Small in-process pool for work that must not hold up a response (image
+# resizing, index refreshes...). Jobs are lost if the process dies, so anything
+# submitted here must also be recoverable by a management command.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='background')
+
+
+def run_in_background(func, *args, **kwargs):
+    # Submitted only once the surrounding transaction commits, so the job sees
+    # the rows that triggered it (and nothing runs if it rolls back).
+    # With BACKGROUND_TASKS_EAGER (e.g. in tests) the job runs in the calling thread.
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+    else:
+        transaction.on_commit(lambda: _executor.submit(_run, func, args, kwargs))
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background job %s failed', getattr(func, '__name__', func))
+    finally:
+        # Worker threads get their own connection, don't leave it open
+        connection.close()
@@ -0,0 +1,113 @@
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each derivative. Every size is written as WebP and
+# as JPEG (PNG for images with transparency) for clients without WebP.
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 960,
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def schedule_image_variants(instance, field_name, variants_field):
+    # Called after save: (re)builds the variants off the request path when the
+    # image changed since they were last generated.
+    image = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if (image.name or None) == variants.get('source'):
+        return
+    run_in_background(
+        build_image_variants, instance._meta.label, instance.pk, field_name, variants_field
+    )
+
+
+def build_image_variants(model_label, pk, field_name, variants_field):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).only(field_name, variants_field).first()
+    if instance is None:
+        return
+    image = getattr(instance, field_name)
+    old_variants = getattr(instance, variants_field) or {}
+
+    variants = generate_variants(image) if image.name else {}
+    # Only store the result if the image was not replaced in the meantime
+    if image.name:
+        unchanged = Q(**{field_name: image.name})
+    else:
+        unchanged = Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True})
+    updated = model.objects.filter(unchanged, pk=pk).update(**{variants_field: variants})
+    if updated:
+        delete_variants(image.storage, old_variants)
+    else:
+        delete_variants(image.storage, variants)
+
+
+def generate_variants(image_file):
+    storage = image_file.storage
+    with storage.open(image_file.name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback_format, fallback_ext = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+
+    folder, filename = os.path.split(image_file.name)
+    stem = os.path.splitext(filename)[0]
+    variants = {'source': image_file.name, 'width': image.width, 'height': image.height}
+    for label, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[label] = {
+            'webp': _save(storage, resized, f'{folder}/variants/{stem}_{label}.webp', 'WEBP', quality=WEBP_QUALITY),
+            fallback_ext: _save(
+                storage, resized, f'{folder}/variants/{stem}_{label}.{fallback_ext}', fallback_format,
+                quality=JPEG_QUALITY, optimize=True,
+            ),
+        }
+    return variants
+
+
+def delete_variants(storage, variants):
+    for label in VARIANT_SIZES:
+        for variant in (variants.get(label) or {}).values():
+            try:
+                storage.delete(variant['name'])
+            except Exception:
+                logger.warning('Could not delete image variant %s', variant.get('name'))
+
+
+def variant_urls(variants, storage, request=None):
+    # Variant map as sent to clients: {size: {format: {url, width, height}}}
+    result = {}
+    for label in VARIANT_SIZES:
+        formats = (variants or {}).get(label)
+        if not formats:
+            continue
+        result[label] = {}
+        for fmt, variant in formats.items():
+            url = storage.url(variant['name'])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            result[label][fmt] = {'url': url, 'width': variant['width'], 'height': variant['height']}
+    return result
+
+
+def _save(storage, image, name, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    name = storage.save(name, ContentFile(buffer.getvalue()))
+    return {'name': name, 'width': image.width, 'height': image.height}
@@ -0,0 +1,189 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Keyset (seek) pagination: instead of OFFSET, each page continues from the
+    # ordering values of the last row it returned, so a page costs the same no
+    # matter how deep it is and rows inserted meanwhile never shift the pages.
+    # The ordering must end with a unique, non-null field (usually id) to be
+    # stable. Nullable fields (and annotations, which may be NULL) sort their
+    # NULLs last; a cursor stores NULL as JSON null.
+    ordering = ('-id',)
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.nullable = self.nullable_fields(queryset)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        queryset = queryset.order_by(*self._order_by(ordering, reverse))
+        if position is not None:
+            position = self.clean_position(queryset, position)
+            queryset = queryset.filter(self._after(ordering, position, reverse))
+
+        # Fetch one extra row to find out whether another page exists.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        values = [self._dump(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, cursor)
+        if self.page_size != type(self).page_size:
+            url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        else:
+            url = remove_query_param(url, self.page_size_query_param)
+        return url
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def nullable_fields(self, queryset):
+        nullable = set()
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if name in queryset.query.annotations or queryset.model._meta.get_field(name).null:
+                nullable.add(name)
+        return nullable
+
+    def clean_position(self, queryset, position):
+        # A cursor comes from the client: every value must convert to the type
+        # of its ordering field (a model field or an annotation), otherwise the
+        # filter would fail in the database. Only nullable fields may be null.
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            if name in queryset.query.annotations:
+                model_field = queryset.query.annotations[name].output_field
+            else:
+                model_field = queryset.model._meta.get_field(name)
+            try:
+                value = model_field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None and name not in self.nullable:
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def _order_by(self, ordering, reverse):
+        # NULLs last, or first when paging backwards so that page is the exact
+        # mirror. Non-null fields keep the plain ordering their indexes are built on.
+        expressions = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if name not in self.nullable:
+                expressions.append(field)
+            else:
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+                expression = F(name)
+                expressions.append(expression.desc(**nulls) if field.startswith('-') else expression.asc(**nulls))
+        return expressions
+
+    def _after(self, ordering, position, reverse):
+        # Expands (a, b, c) > (x, y, z) into
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        # with > turned into < for descending fields. A NULL sorts after every
+        # value (before, when paging backwards) and equals only NULL.
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            if value is None:
+                after = Q(**{f'{name}__isnull': False}) if reverse else None
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__{lookup}': value})
+                if name in self.nullable and not reverse:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            if after is not None:
+                condition |= equal & after
+            equal &= same
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _dump(value):
+        # Keep full microsecond precision, DjangoJSONEncoder would truncate it.
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroker:
+    # Publish/subscribe between threads of one process: sync code (views,
+    # background jobs) publishes, async views subscribe. Messages only reach
+    # subscribers in the same process, so with several worker processes set
+    # PUBSUB_BROKER to a class with the same publish/subscribe interface
+    # backed by a shared transport (e.g. Redis or Postgres LISTEN/NOTIFY).
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                # Its event loop is closed (the server shut it down without the
+                # stream unsubscribing): nobody will read it again
+                logger.warning('Dropping subscriber on %s, its event loop is closed', channel)
+                self.unsubscribe(subscription)
+
+    def has_subscribers(self, channel):
+        return channel in self._subscribers
+
+    def subscribe(self, channel):
+        # Must be called from the event loop that will read the messages
+        subscription = Subscription(self, channel, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class Subscription:
+    def __init__(self, broker, channel, loop, queue_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, message):
+        # A reader that stopped reading must not make the queue grow forever;
+        # it can catch up from the database when it reconnects.
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning('Dropping message for slow subscriber on %s', self.channel)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'PUBSUB_BROKER', 'backend.pubsub.InProcessBroker'))()
+    return _broker
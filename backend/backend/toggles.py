@@ -0,0 +1,44 @@
+from django.db import connection
+
+# Removes the (object, user) row of a many-to-many through table, or adds it if
+# there was none, in one statement. `present` tells a missing object apart from
+# a row a concurrent toggle inserted first (the INSERT then hits ON CONFLICT).
+TOGGLE_SQL = """
+    WITH removed AS (
+        DELETE FROM {through} WHERE {column} = %(object)s AND {user_column} = %(user)s
+        RETURNING 1
+    ), present AS (
+        SELECT 1 FROM {table} WHERE id = %(object)s
+    ), added AS (
+        INSERT INTO {through} ({column}, {user_column})
+        SELECT %(object)s, %(user)s
+        WHERE NOT EXISTS (SELECT 1 FROM removed) AND EXISTS (SELECT 1 FROM present)
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM removed), EXISTS (SELECT 1 FROM added), EXISTS (SELECT 1 FROM present)
+"""
+
+
+def toggle_membership(through, column, object_id, user, user_column='user'):
+    # Toggles the row linking the object to the user in `through`, where `column`
+    # and `user_column` are the names of its two foreign keys. Returns True if
+    # the row now exists, False if it was removed and None if the object does
+    # not exist.
+    object_field = through._meta.get_field(column)
+    sql = TOGGLE_SQL.format(
+        through=connection.ops.quote_name(through._meta.db_table),
+        table=connection.ops.quote_name(object_field.related_model._meta.db_table),
+        column=connection.ops.quote_name(object_field.column),
+        user_column=connection.ops.quote_name(through._meta.get_field(user_column).column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'object': object_id, 'user': user.pk})
+        removed, added, present = cursor.fetchone()
+    if added:
+        return True
+    if removed:
+        return False
+    # Neither: the object is gone, or a concurrent identical toggle added the
+    # row after our DELETE looked, which leaves it in the state we were after
+    return True if present else None
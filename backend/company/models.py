@@ -7,6 +7,8 @@ class Company(models.Model):
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True)
     logo = models.ImageField(upload_to="company_logos/")
+    # Resized copies of logo, see backend.images
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField()
     
     def __str__(self):
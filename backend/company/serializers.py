@@ -1,9 +1,15 @@
 from rest_framework import serializers
 from .models import Company
+from backend.images import variant_urls
 
 class CompanySerializer(serializers.ModelSerializer):
+    logo_variants=serializers.SerializerMethodField()
+
     class Meta:
         model=Company
         fields='__all__'
 
-        
\ No newline at end of file
+    def get_logo_variants(self, obj):
+        return variant_urls(obj.logo_variants, obj.logo.storage, self.context.get('request'))
+
+        
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Company
+from backend.images import schedule_image_variants
+
+
+@receiver(post_save, sender=Company)
+def refresh_logo_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_image_variants(instance, 'logo', 'logo_variants')
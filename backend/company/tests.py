@@ -1,3 +1,105 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from backend.images import VARIANT_SIZES
+from .models import Company
+from .serializers import CompanySerializer
+
+
+def image_upload(name, mode, size=(2000, 1000), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 100, 50, 128) if mode == 'RGBA' else (200, 100, 50)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class LogoVariantTests(APITestCase):
+    # Logos get a WebP and a fallback (JPEG, or PNG with transparency) copy per
+    # size in VARIANT_SIZES, built after the save commits.
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def add_company(self, logo, slug='acme'):
+        with self.captureOnCommitCallbacks(execute=True):
+            company = Company.objects.create(name=slug.title(), slug=slug, logo=logo, description='x')
+        company.refresh_from_db()
+        return company
+
+    def test_variants(self):
+        company = self.add_company(image_upload('acme.jpg', 'RGB', image_format='JPEG'))
+        variants = company.logo_variants
+        self.assertEqual(variants['source'], company.logo.name)
+        self.assertEqual((variants['width'], variants['height']), (2000, 1000))
+        for label, size in VARIANT_SIZES.items():
+            self.assertEqual(set(variants[label]), {'webp', 'jpg'})
+            for fmt, variant in variants[label].items():
+                self.assertEqual((variant['width'], variant['height']), (size, size // 2))
+                with company.logo.storage.open(variant['name']) as f, Image.open(f) as image:
+                    self.assertEqual(image.format, {'webp': 'WEBP', 'jpg': 'JPEG'}[fmt])
+                    self.assertEqual(image.size, (size, size // 2))
+
+    def test_transparent_logo_falls_back_to_png(self):
+        company = self.add_company(image_upload('acme.png', 'RGBA', size=(100, 200)))
+        # Smaller than every size: never scaled up
+        self.assertEqual(set(company.logo_variants['thumb']), {'webp', 'png'})
+        self.assertEqual(company.logo_variants['thumb']['png']['width'], 100)
+
+    def test_replaced_logo_rebuilds_variants(self):
+        company = self.add_company(image_upload('acme.png', 'RGB'))
+        old = company.logo_variants['thumb']['webp']['name']
+        with self.captureOnCommitCallbacks(execute=True):
+            company.logo = image_upload('new.png', 'RGB')
+            company.save()
+        company.refresh_from_db()
+        self.assertEqual(company.logo_variants['source'], company.logo.name)
+        self.assertFalse(company.logo.storage.exists(old))
+
+    def test_serializer_urls(self):
+        company = self.add_company(image_upload('acme.png', 'RGB'))
+        request = APIRequestFactory().get('/api/company/')
+        data = CompanySerializer(company, context={'request': request}).data['logo_variants']
+        self.assertEqual(set(data), set(VARIANT_SIZES))
+        thumb = data['thumb']['webp']
+        self.assertEqual(thumb['url'], 'http://testserver/media/' + company.logo_variants['thumb']['webp']['name'])
+        self.assertEqual((thumb['width'], thumb['height']), (320, 160))
+
+        # Not built yet
+        Company.objects.filter(pk=company.pk).update(logo_variants={})
+        company.refresh_from_db()
+        self.assertEqual(CompanySerializer(company, context={'request': request}).data['logo_variants'], {})
+
+    def test_backfill_command_is_idempotent(self):
+        built = self.add_company(image_upload('acme.png', 'RGB'))
+        # Uploaded before variants existed
+        missing = self.add_company(image_upload('globex.png', 'RGB'), slug='globex')
+        Company.objects.filter(pk=missing.pk).update(logo_variants={})
+        self.add_company('', slug='initech')
+
+        def run(*args):
+            stdout = StringIO()
+            call_command('generate_image_variants', *args, stdout=stdout)
+            return stdout.getvalue()
+
+        self.assertIn('company.Company: built variants for 1 images', run())
+        missing.refresh_from_db()
+        self.assertEqual(missing.logo_variants['source'], missing.logo.name)
+        variants = {company.pk: company.logo_variants for company in Company.objects.all()}
+
+        self.assertIn('company.Company: built variants for 0 images', run())
+        self.assertEqual({company.pk: company.logo_variants for company in Company.objects.all()}, variants)
+
+        self.assertIn('company.Company: built variants for 2 images', run('--force'))
+        built.refresh_from_db()
+        self.assertTrue(built.logo.storage.exists(built.logo_variants['thumb']['webp']['name']))
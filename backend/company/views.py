@@ -5,7 +5,7 @@ from .serializers import *
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from experience.serializers import ExperienceSerializer
+from experience.serializers import ExperienceListSerializer
 
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -68,12 +68,12 @@ class CompanyExperienceList(APIView):
         except Company.DoesNotExist:
             return Response({"detail": "Company not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        experiences = company.experiences.all()
+        experiences = company.experiences.for_list().with_saved(request.user)
 
         if request.user.role not in ['admin', 'spoc']:
             experiences = experiences.filter(visibility=True, verified=True)
 
-        serializer = ExperienceSerializer(experiences, many=True, context={'request': request})
+        serializer = ExperienceListSerializer(experiences, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class ListCompanies(generics.ListAPIView):
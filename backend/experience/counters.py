@@ -0,0 +1,85 @@
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Experience
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per statement when flushing
+FLUSH_BATCH_SIZE = 500
+
+
+class ViewCounter:
+    # Counts experience views in memory and writes them out every
+    # EXPERIENCE_VIEW_FLUSH_INTERVAL seconds as batched
+    # UPDATE ... SET views = views + n, instead of one row lock per page view.
+    # Each worker process has its own counter, flushed by a timer thread that is
+    # started by the first view after a flush; a crash or exit loses at most one
+    # interval.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._timer = None
+        self._database = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'EXPERIENCE_VIEW_FLUSH_INTERVAL', 30)
+
+    def hit(self, experience_id):
+        with self._lock:
+            self._pending[int(experience_id)] += 1
+            if self._timer is None:
+                # Remember which database the views belong to: the test runner
+                # points the connection back at another one when it's done
+                self._database = connection.settings_dict['NAME']
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_thread)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, database = self._take()
+        if not pending:
+            return
+        if database != connection.settings_dict['NAME']:
+            logger.warning('Dropping %s pending experience views counted on another database', len(pending))
+            return
+        write_views(pending)
+
+    def _take(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        pending, self._pending, self._timer = self._pending, Counter(), None
+        return pending, self._database
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush pending experience views')
+        finally:
+            # The timer thread opened its own connection
+            connection.close()
+
+
+def write_views(counts):
+    # Sorted ids so concurrent flushes from other workers lock rows in the same order
+    ids = sorted(counts)
+    for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+        batch = ids[start:start + FLUSH_BATCH_SIZE]
+        increment = Case(
+            *[When(pk=pk, then=Value(counts[pk])) for pk in batch],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        Experience.objects.filter(pk__in=batch).update(views=F('views') + increment)
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from backend.images import build_image_variants
+from company.models import Company
+from experience.models import Experience
+
+IMAGE_FIELDS = [
+    (Experience, 'cover_image', 'cover_image_variants'),
+    (Company, 'logo', 'logo_variants'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds the resized/WebP variants of experience cover images and company logos '
+        'that are missing or out of date (e.g. uploads made before variants existed, or '
+        'jobs lost when a worker restarted).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants even if they look up to date')
+
+    def handle(self, *args, **options):
+        for model, field_name, variants_field in IMAGE_FIELDS:
+            built = 0
+            rows = (
+                model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .values_list('pk', field_name, variants_field)
+                .order_by('pk')
+                .iterator()
+            )
+            for pk, name, variants in rows:
+                if not options['force'] and (variants or {}).get('source') == name:
+                    continue
+                try:
+                    build_image_variants(model._meta.label, pk, field_name, variants_field)
+                    built += 1
+                except Exception as e:
+                    self.stderr.write(f'{model._meta.label} {pk}: {e}')
+            self.stdout.write(f'{model._meta.label}: built variants for {built} images')
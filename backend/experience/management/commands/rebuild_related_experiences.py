@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from experience.models import Experience
+from experience.related import refresh_related
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the related-experiences index for every verified, visible experience. '
+        'Normally it is refreshed incrementally; run this after changing the scoring or '
+        'to repair it after bulk edits that bypass signals.'
+    )
+
+    def handle(self, *args, **options):
+        ids = Experience.objects.filter(visibility=True, verified=True).order_by('pk').values_list('pk', flat=True)
+        count = 0
+        for experience_id in ids.iterator():
+            refresh_related(experience_id)
+            count += 1
+        self.stdout.write(f'Refreshed related experiences for {count} experiences')
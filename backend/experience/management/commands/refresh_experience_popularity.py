@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models.expressions import RawSQL
+
+from experience.models import Experience
+
+# Time-decayed score: views / (age in hours + 2) ^ GRAVITY, so new posts with a
+# burst of views outrank old ones that collected views over years.
+GRAVITY = 1.5
+POPULARITY_SQL = f"views / power(extract(epoch from (now() - published_date)) / 3600 + 2, {GRAVITY})"
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the time-decayed popularity score behind ?ordering=popular on the '
+        'experience feed. Run it periodically (e.g. every 15 minutes from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(
+            Experience.objects.filter(visibility=True, verified=True, views__gt=0)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        # Short UPDATEs over id batches rather than one long statement over the table
+        for start in range(0, len(ids), batch_size):
+            Experience.objects.filter(pk__in=ids[start:start + batch_size]).update(
+                popularity=RawSQL(POPULARITY_SQL, [])
+            )
+        self.stdout.write(f'Updated popularity of {len(ids)} experiences')
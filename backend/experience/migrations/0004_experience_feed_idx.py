@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0001_initial'),
+        ('experience', '0003_experience_saved_by'),
+        ('tag', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(condition=models.Q(('verified', True), ('visibility', True)), fields=['-published_date', '-id'], name='experience_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.2 on 2026-10-18 17:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# Frozen copy of experience.search.UPDATE_SEARCH_VECTOR_SQL as it was when this
+# migration was written, applied to existing rows. Deliberately not imported: a
+# later change to the document must not change what this migration does, it
+# needs a new migration that rebuilds search_vector with the new document.
+BACKFILL_SEARCH_VECTOR_SQL = """
+    UPDATE experience_experience AS e SET search_vector =
+        setweight(to_tsvector('english', coalesce(e.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(e.role, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(c.name, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(e.short_description, '')), 'D') ||
+        setweight(coalesce(jsonb_to_tsvector('english', e.content, '["string"]'), ''::tsvector), 'D')
+    FROM company_company AS c
+    WHERE c.id = e.company_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0001_initial'),
+        ('experience', '0004_experience_feed_idx'),
+        ('tag', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experience',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='experience_search_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR_SQL, migrations.RunSQL.noop),
+    ]
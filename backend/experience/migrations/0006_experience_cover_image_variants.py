@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experience', '0005_experience_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experience',
+            name='cover_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
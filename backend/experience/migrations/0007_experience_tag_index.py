@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-18 17:59
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_company_logo_variants'),
+        ('experience', '0006_experience_cover_image_variants'),
+        ('tag', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experience',
+            name='tag_index',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_index'], name='experience_tag_index_idx'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE experience_experience AS e SET tag_index = ARRAY(
+                SELECT t.tag_id FROM experience_experience_tags AS t
+                WHERE t.experience_id = e.id ORDER BY t.tag_id
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
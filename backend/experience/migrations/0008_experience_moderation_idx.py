@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_company_logo_variants'),
+        ('experience', '0007_experience_tag_index'),
+        ('tag', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(condition=models.Q(('verified', False), ('visibility', True)), fields=['published_date', 'id'], name='experience_moderation_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experience', '0008_experience_moderation_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedExperience',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('experience', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='experience.experience')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to_entries', to='experience.experience')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['experience', '-score'], name='related_experience_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('experience', 'related'), name='unique_related_experience')],
+            },
+        ),
+    ]
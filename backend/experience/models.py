@@ -1,13 +1,52 @@
 from django.db import models
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
+from backend.toggles import toggle_membership
 from user.models import User
 from company.models import Company
 from tag.models import Tag
 
 # Create your models here.
 
+class ExperienceQuerySet(models.QuerySet):
+    def with_related(self):
+        # Everything ExperienceSerializer renders: author and company are joined in,
+        # tags (with their type) come in one extra query for the whole page.
+        # search_vector is only used for filtering, never sent to the client.
+        return self.defer('search_vector').select_related('author', 'company').prefetch_related(
+            models.Prefetch('tags', queryset=Tag.objects.select_related('type')),
+        )
+
+    def with_saved(self, user):
+        # is_saved for the given user as one EXISTS subquery instead of a lookup per row
+        saved = Experience.saved_by.through.objects.filter(experience_id=models.OuterRef('pk'), user_id=user.pk)
+        return self.annotate(is_saved=models.Exists(saved))
+
+    def toggle_saved(self, experience_id, user):
+        # Saves the experience for the user, or unsaves it if it was saved, in one
+        # statement. Returns True if it is now saved, False if it was unsaved and
+        # None if the experience does not exist.
+        return toggle_membership(Experience.saved_by.through, 'experience', experience_id, user)
+
+    def refresh_tag_index(self):
+        # Rebuilds tag_index from the tags through table for the selected rows
+        through = Experience.tags.through
+        tag_ids = through.objects.filter(experience_id=models.OuterRef('pk')).order_by('tag_id').values('tag_id')
+        return self.update(tag_index=ArraySubquery(tag_ids))
+
+    def for_list(self):
+        # List cards never show the body, so the (possibly large, TOASTed) content
+        # column isn't even read; only ExperienceDetail loads it.
+        return self.with_related().defer('content')
+
+
 class Experience(models.Model):
     cover_image= models.ImageField(upload_to='experience_images/',null=True,blank=True)
+    # Resized copies of cover_image, see backend.images
+    cover_image_variants=models.JSONField(default=dict, blank=True, editable=False)
 
     title = models.CharField(max_length=200)
     role = models.CharField(max_length=100)
@@ -32,5 +71,75 @@ class Experience(models.Model):
     tags=models.ManyToManyField(Tag, related_name='experiences', blank=True)
 
     saved_by=models.ManyToManyField(User, related_name='saved_experiences', blank=True)
+
+    # views is written in batches by experience.counters, popularity by the
+    # refresh_experience_popularity command
+    views=models.PositiveIntegerField(default=0, editable=False)
+    popularity=models.FloatField(default=0, editable=False)
+
+    # Copy of the tag ids, so tag filters are one GIN lookup without joins or DISTINCT.
+    # Kept in sync with tags by the signals in experience/signals.py
+    tag_index=ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+
+    # Full text search document, maintained by experience.search.update_search_vectors
+    search_vector=SearchVectorField(null=True, editable=False)
+
+    objects = ExperienceQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the verified feed ordered by (published_date, id), see ExperienceCursorPagination
+            models.Index(
+                fields=['-published_date', '-id'],
+                condition=models.Q(visibility=True, verified=True),
+                name='experience_feed_idx',
+            ),
+            # Serves ?ordering=popular on the feed
+            models.Index(
+                fields=['-popularity', '-id'],
+                condition=models.Q(visibility=True, verified=True),
+                name='experience_popular_idx',
+            ),
+            # Serves the moderation queue, oldest unverified first
+            models.Index(
+                fields=['published_date', 'id'],
+                condition=models.Q(visibility=True, verified=False),
+                name='experience_moderation_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='experience_search_idx'),
+            GinIndex(fields=['tag_index'], name='experience_tag_index_idx'),
+        ]
+
+    # Columns only ever written by their own UPDATE statements (see the comments
+    # on the fields). Saving an instance must not put back the values it loaded.
+    maintained_fields = {'views', 'popularity', 'tag_index', 'search_vector'}
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.maintained_fields
+                and field.attname not in self.get_deferred_fields()
+            ]
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f" {self.author.name} | {self.company.name} | {self.title}"
+
+
+class RelatedExperience(models.Model):
+    # Precomputed "similar experiences" index, maintained by experience/related.py
+    experience=models.ForeignKey(Experience, on_delete=models.CASCADE, related_name='related_entries')
+    related=models.ForeignKey(Experience, on_delete=models.CASCADE, related_name='related_to_entries')
+    score=models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['experience', 'related'], name='unique_related_experience'),
+        ]
+        indexes = [
+            models.Index(fields=['experience', '-score'], name='related_experience_score_idx'),
+        ]
+
     def __str__(self):
-        return f" {self.author.name} | {self.company.name} | {self.title}"
\ No newline at end of file
+        return f"{self.experience_id} -> {self.related_id} ({self.score:.2f})"
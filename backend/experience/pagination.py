@@ -0,0 +1,5 @@
+from backend.pagination import KeysetPagination
+
+
+class ExperienceCursorPagination(KeysetPagination):
+    ordering = ('-published_date', '-id')
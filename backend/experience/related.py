@@ -0,0 +1,128 @@
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+
+from backend.background import run_in_background
+from .models import Experience, RelatedExperience
+
+# score = TAG_WEIGHT * Jaccard(tags) + COMPANY_WEIGHT * same company + JOB_TYPE_WEIGHT * same job_type
+TAG_WEIGHT = 1.0
+COMPANY_WEIGHT = 0.5
+JOB_TYPE_WEIGHT = 0.25
+# Best matches stored for an experience each time it is refreshed
+MAX_RELATED = 20
+# pg_advisory_xact_lock key serializing refreshes: one touches the lists of
+# many experiences, so two running at once would insert the same rows
+REFRESH_LOCK_KEY = 7310251
+
+
+def similarity(a, b):
+    tags_a, tags_b = set(a['tag_index']), set(b['tag_index'])
+    union = tags_a | tags_b
+    score = TAG_WEIGHT * (len(tags_a & tags_b) / len(union) if union else 0)
+    if a['company_id'] == b['company_id']:
+        score += COMPANY_WEIGHT
+    if a['job_type'] == b['job_type']:
+        score += JOB_TYPE_WEIGHT
+    return score
+
+
+# Keeps only the best MAX_RELATED rows of each of the given experiences
+TRIM_SQL = """
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (PARTITION BY experience_id ORDER BY score DESC, related_id) AS rank
+            FROM {table} WHERE experience_id = ANY(%(ids)s)
+        ) ranked WHERE rank > %(limit)s
+    )
+"""
+
+FIELDS = ('id', 'tag_index', 'company_id', 'job_type')
+
+
+def scored_candidates(experience):
+    # (score, id) of every experience that could be related, best first.
+    # Only experiences sharing a tag or the company can score above the job_type bonus.
+    candidates = (
+        Experience.objects.filter(visibility=True, verified=True)
+        .filter(Q(tag_index__overlap=experience['tag_index']) | Q(company_id=experience['company_id']))
+        .exclude(pk=experience['id'])
+        .values(*FIELDS)
+    )
+    scored = ((similarity(experience, candidate), candidate['id']) for candidate in candidates)
+    # Ties in the same order TRIM_SQL keeps them
+    return sorted(scored, key=lambda pair: (-pair[0], pair[1]))
+
+
+def rewrite_outgoing(experience_id):
+    # Replaces the list of one experience with its current best MAX_RELATED
+    RelatedExperience.objects.filter(experience_id=experience_id).delete()
+    experience = Experience.objects.filter(pk=experience_id, visibility=True, verified=True).values(*FIELDS).first()
+    if experience is None:
+        return []
+    scored = scored_candidates(experience)
+    RelatedExperience.objects.bulk_create([
+        RelatedExperience(experience_id=experience_id, related_id=related_id, score=score)
+        for score, related_id in scored[:MAX_RELATED]
+    ])
+    return scored
+
+
+def trim(experience_ids):
+    if not experience_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TRIM_SQL.format(table=RelatedExperience._meta.db_table),
+            {'ids': list(experience_ids), 'limit': MAX_RELATED},
+        )
+
+
+def refresh_related(experience_id):
+    # Recomputes the related experiences of one experience, and its place in
+    # the lists of the others: every list stays the best MAX_RELATED of its
+    # experience, as if it had been recomputed from scratch.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [REFRESH_LOCK_KEY])
+        # Lists it was in (with its score there); they get it back below if it still belongs there
+        previous = dict(
+            RelatedExperience.objects.filter(related_id=experience_id).values_list('experience_id', 'score')
+        )
+        RelatedExperience.objects.filter(related_id=experience_id).delete()
+        # Empty when it was deleted, hidden or unverified: it must not be recommended anywhere
+        scored = rewrite_outgoing(experience_id)
+
+        # Add it to the candidates' lists it makes it into, then cut those
+        # lists back to MAX_RELATED
+        lists = {
+            row['experience_id']: row
+            for row in RelatedExperience.objects.filter(experience_id__in=[related_id for _, related_id in scored])
+            .values('experience_id')
+            .annotate(size=Count('id'), lowest=Min('score'))
+        }
+        offers = [
+            (score, related_id) for score, related_id in scored
+            if related_id not in lists
+            or lists[related_id]['size'] < MAX_RELATED
+            or score >= lists[related_id]['lowest']
+        ]
+        RelatedExperience.objects.bulk_create([
+            RelatedExperience(experience_id=related_id, related_id=experience_id, score=score)
+            for score, related_id in offers
+        ])
+        trim({related_id for _, related_id in offers})
+
+        # A list that lost it, or kept it with a lower score, may now have room
+        # for an experience it doesn't store; it has to be recomputed
+        kept = dict(
+            RelatedExperience.objects.filter(related_id=experience_id, experience_id__in=previous)
+            .values_list('experience_id', 'score')
+        )
+        for other_id, score in previous.items():
+            if other_id not in kept or kept[other_id] < score:
+                rewrite_outgoing(other_id)
+
+
+def schedule_related_refresh(experience_ids):
+    for experience_id in set(experience_ids):
+        run_in_background(refresh_related, experience_id)
@@ -0,0 +1,99 @@
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import CharField, Count, F, FloatField, Value
+from django.db.models.functions import Cast, ExtractYear
+
+from .models import Experience
+
+SEARCH_CONFIG = 'english'
+
+# Facet name -> what it groups on. Values match the filters ExperienceSearch
+# accepts (company slug, job_type, year, department, tag id).
+FACETS = {
+    'company': F('company__slug'),
+    'job_type': F('job_type'),
+    'year': ExtractYear('experience_date'),
+    'department': F('author__department'),
+    'tags': F('tags__id'),
+}
+
+# search_vector is weighted title (A) > role (B) > company name (C) > short
+# description and the strings inside content (D). The company name lives in
+# another table, so the vector is filled in with an UPDATE ... FROM rather than
+# a generated column; it is refreshed by the signals in experience/signals.py.
+# Migration 0005 holds a frozen copy for its backfill: changing the document
+# here needs a new migration that refills search_vector.
+UPDATE_SEARCH_VECTOR_SQL = """
+    UPDATE experience_experience AS e SET search_vector =
+        setweight(to_tsvector(%(config)s, coalesce(e.title, '')), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce(e.role, '')), 'B') ||
+        setweight(to_tsvector(%(config)s, coalesce(c.name, '')), 'C') ||
+        setweight(to_tsvector(%(config)s, coalesce(e.short_description, '')), 'D') ||
+        setweight(coalesce(jsonb_to_tsvector(%(config)s, e.content, '["string"]'), ''::tsvector), 'D')
+    FROM company_company AS c
+    WHERE c.id = e.company_id
+"""
+
+
+def update_search_vectors(experience_ids=None, company_id=None):
+    sql = UPDATE_SEARCH_VECTOR_SQL
+    params = {'config': SEARCH_CONFIG}
+    if experience_ids is not None:
+        sql += ' AND e.id = ANY(%(ids)s)'
+        params['ids'] = list(experience_ids)
+    if company_id is not None:
+        sql += ' AND e.company_id = %(company_id)s'
+        params['company_id'] = company_id
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def build_search_query(text):
+    # Every word becomes a prefix match so results show up while the user is
+    # still typing ("goog sde" finds "Google SDE intern"). Anything that is not
+    # a word character is dropped, so user input can never break to_tsquery.
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG)
+
+
+def annotate_search(queryset, query):
+    # rank is cast to double precision so the value sent back in a pagination
+    # cursor compares equal to the one stored in the row.
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+        headline=SearchHeadline(
+            'short_description',
+            query,
+            config=SEARCH_CONFIG,
+            start_sel='<mark>',
+            stop_sel='</mark>',
+            max_words=35,
+            min_words=15,
+        ),
+    )
+
+
+def experience_facets(queryset):
+    # One grouped count per facet, glued together with UNION ALL so all facets
+    # cost a single round trip. The filtered queryset is used as a subquery so
+    # its own joins (e.g. on tags) don't narrow down the facet groups.
+    base = Experience.objects.filter(pk__in=queryset.values('pk'))
+    counts = [
+        base.annotate(facet=Value(name), value=Cast(expression, CharField()))
+        .values('facet', 'value')
+        .annotate(count=Count('pk', distinct=True))
+        .order_by()
+        for name, expression in FACETS.items()
+    ]
+
+    facets = {name: [] for name in FACETS}
+    for row in counts[0].union(*counts[1:], all=True):
+        if row['value'] is not None:
+            facets[row['facet']].append({'value': row['value'], 'count': row['count']})
+    for values in facets.values():
+        values.sort(key=lambda item: (-item['count'], item['value']))
+    return facets
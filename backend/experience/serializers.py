@@ -5,6 +5,7 @@ from tag.models import Tag
 from tag.serializers import TagSerializer
 from company.serializers import CompanySerializer
 from company.models import Company
+from backend.images import variant_urls
 
 class AuthorSerialzer(serializers.ModelSerializer):
     class Meta:
@@ -30,16 +31,26 @@ class ExperienceSerializer(serializers.ModelSerializer):
         source='tags', # maps to tag field in Experience model
         required=False
     )
+    cover_image_variants=serializers.SerializerMethodField()
+    is_saved=serializers.SerializerMethodField()
+
     class Meta:
         model=Experience
-        fields='__all__'
+        exclude=['search_vector','tag_index','saved_by','popularity']
         read_only_fields=['author','published_date']
+
+    def get_cover_image_variants(self, obj):
+        return variant_urls(obj.cover_image_variants, obj.cover_image.storage, self.context.get('request'))
+
+    def get_is_saved(self, obj):
+        # Annotated by ExperienceQuerySet.with_saved
+        return getattr(obj, 'is_saved', False)
     
     def validate(self, attrs):
         if(self.instance is None):
             if 'company' not in attrs:
                 raise serializers.ValidationError("Company ID is required for creating an experience.")
-            return attrs
+        return attrs
 
     def create(self,validated_data):
         tags=validated_data.pop('tags',[])
@@ -67,3 +78,14 @@ class ExperienceSerializer(serializers.ModelSerializer):
         else:
             # Everyone else is denied
             raise serializers.ValidationError("You do not have permission to update this experience.")
+
+
+class ExperienceListSerializer(ExperienceSerializer):
+    # Used by every list endpoint: same as ExperienceSerializer without the body
+    class Meta(ExperienceSerializer.Meta):
+        exclude=['search_vector','tag_index','saved_by','popularity','content']
+
+
+class ExperienceSearchSerializer(ExperienceListSerializer):
+    rank=serializers.FloatField(read_only=True)
+    headline=serializers.CharField(read_only=True)
@@ -0,0 +1,64 @@
+from django.db.models import BigIntegerField, F, Func, Value
+from django.db.models.functions import Cast
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from company.models import Company
+from tag.models import Tag
+from .models import Experience
+from .related import schedule_related_refresh
+from .search import update_search_vectors
+from backend.images import schedule_image_variants
+
+
+@receiver(post_save, sender=Experience)
+def refresh_experience_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    update_search_vectors(experience_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Company)
+def refresh_company_search_vectors(sender, instance, raw=False, **kwargs):
+    # The company name is part of every one of its experiences' vectors
+    if raw:
+        return
+    update_search_vectors(company_id=instance.pk)
+
+
+@receiver(post_save, sender=Experience)
+def refresh_related_experiences(sender, instance, raw=False, **kwargs):
+    # company, job_type, verified or visibility may have changed
+    if raw:
+        return
+    schedule_related_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Experience)
+def refresh_cover_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_image_variants(instance, 'cover_image', 'cover_image_variants')
+
+
+@receiver(m2m_changed, sender=Experience.tags.through)
+def refresh_tag_index(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        experience_ids = [instance.pk]
+    elif action == 'post_clear':
+        # tag.experiences.clear(): pk_set is not provided
+        experience_ids = list(Experience.objects.filter(tag_index__contains=[instance.pk]).values_list('pk', flat=True))
+    else:
+        experience_ids = list(pk_set)
+    Experience.objects.filter(pk__in=experience_ids).refresh_tag_index()
+    schedule_related_refresh(experience_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def remove_deleted_tag_from_index(sender, instance, **kwargs):
+    # The through rows are removed by the cascade, which sends no m2m_changed
+    Experience.objects.filter(tag_index__contains=[instance.pk]).update(
+        tag_index=Func(F('tag_index'), Cast(Value(instance.pk), BigIntegerField()), function='array_remove')
+    )
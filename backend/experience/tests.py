@@ -1,3 +1,678 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import time
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import NullIf
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from backend.background import _run, run_in_background
+from backend.pagination import KeysetPagination
+from user.models import User
+from company.models import Company
+from tag.models import Tag, TagType
+from opportunity.models import Notification
+from .counters import view_counter, write_views
+from .models import Experience, RelatedExperience
+from .related import refresh_related, scored_candidates
+
+
+class ExperienceListQueryCountTests(APITestCase):
+    # The number of queries behind every experience list must not grow with the
+    # number of rows returned (no N+1 on author, company, tags or tag types).
+
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='admin', department='CSE')
+        self.company = Company.objects.create(name='Acme', slug='acme', logo='company_logos/acme.png', description='Acme')
+        tag_type = TagType.objects.create(name='Domain')
+        self.tags = [Tag.objects.create(title=f'tag-{i}', type=tag_type) for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def add_experiences(self, count, author=None, **kwargs):
+        for i in range(count):
+            experience_author = author or User.objects.create(
+                email=f'author{Experience.objects.count()}@nitc.ac.in', name='Author', role='student'
+            )
+            experience = Experience.objects.create(
+                title=f'Experience {i}',
+                role='SDE',
+                short_description='Short description',
+                experience_date=date(2025, 1, 1),
+                job_type='internship',
+                author=experience_author,
+                company=self.company,
+                **kwargs
+            )
+            experience.tags.set(self.tags)
+            experience.saved_by.add(self.user)
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data or {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, method, url, data=None, **kwargs):
+        self.add_experiences(2, **kwargs)
+        few = self.count_queries(method, url, data)
+        self.add_experiences(8, **kwargs)
+        many = self.count_queries(method, url, data)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 5)
+
+    def test_verified_list(self):
+        self.assertConstantQueries('post', '/api/experience', {'tag_ids': [self.tags[0].id]}, verified=True)
+
+    def test_search(self):
+        self.assertConstantQueries('post', '/api/experience/search', {'search': 'Experience'}, verified=True)
+
+    def test_unverified_list(self):
+        self.assertConstantQueries('get', '/api/experience/unverified')
+
+    def test_my_experiences(self):
+        self.assertConstantQueries('get', '/api/experience/self', author=self.user)
+
+    def test_saved_experiences(self):
+        self.assertConstantQueries('get', '/api/experience/saved')
+
+    def test_company_experiences(self):
+        self.assertConstantQueries('get', '/api/company/acme/experiences', verified=True)
+
+    def test_lists_do_not_load_content(self):
+        self.addCleanup(view_counter.flush)
+        self.add_experiences(2, verified=True, content={'blocks': ['a long body']})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/experience', {}, format='json')
+        self.assertNotIn('content', response.data['results'][0])
+        main_query = next(q['sql'] for q in context.captured_queries if 'FROM "experience_experience"' in q['sql'])
+        self.assertNotIn('"experience_experience"."content"', main_query)
+
+        experience_id = response.data['results'][0]['id']
+        response = self.client.get(f'/api/experience/{experience_id}')
+        self.assertEqual(response.data['content'], {'blocks': ['a long body']})
+
+
+class ToggleSavedTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.experience = Experience.objects.create(
+            title='Experience', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=self.user, company=company, verified=True,
+        )
+        self.client.force_authenticate(self.user)
+
+    def is_saved(self):
+        return self.experience.saved_by.filter(pk=self.user.pk).exists()
+
+    def test_toggle_twice(self):
+        with self.assertNumQueries(1):
+            self.assertIs(Experience.objects.toggle_saved(self.experience.pk, self.user), True)
+        self.assertTrue(self.is_saved())
+        self.assertIs(Experience.objects.toggle_saved(self.experience.pk, self.user), False)
+        self.assertFalse(self.is_saved())
+
+        response = self.client.post(f'/api/experience/{self.experience.pk}/save_unsave')
+        self.assertTrue(response.data['is_saved'])
+        response = self.client.post(f'/api/experience/{self.experience.pk}/save_unsave')
+        self.assertFalse(response.data['is_saved'])
+        self.assertFalse(self.is_saved())
+
+    def test_missing_experience(self):
+        self.assertIsNone(Experience.objects.toggle_saved(self.experience.pk + 1, self.user))
+        response = self.client.post(f'/api/experience/{self.experience.pk + 1}/save_unsave')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Experience.saved_by.through.objects.exists())
+
+
+class ConcurrentToggleSavedTests(TransactionTestCase):
+    # Two identical save requests racing: the second one's DELETE misses the
+    # first one's uncommitted row and its INSERT then conflicts with it.
+
+    def test_concurrent_identical_toggles(self):
+        user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        experience = Experience.objects.create(
+            title='Experience', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=user, company=company, verified=True,
+        )
+        results = {}
+        started = threading.Event()
+
+        def toggle():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                results['pid'] = cursor.fetchone()[0]
+            started.set()
+            try:
+                results['saved'] = Experience.objects.toggle_saved(experience.pk, user)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=toggle)
+        with transaction.atomic():
+            self.assertIs(Experience.objects.toggle_saved(experience.pk, user), True)
+            thread.start()
+            started.wait()
+            with connection.cursor() as cursor:
+                for _ in range(500):
+                    cursor.execute('SELECT cardinality(pg_blocking_pids(%s)) > 0', [results['pid']])
+                    if cursor.fetchone()[0]:
+                        break
+                    time.sleep(0.01)
+        thread.join()
+        self.assertIs(results['saved'], True)
+        self.assertTrue(experience.saved_by.filter(pk=user.pk).exists())
+
+
+class ExperienceCursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.client.force_authenticate(self.user)
+        for i in range(25):
+            self.add(i)
+
+    def add(self, i):
+        return Experience.objects.create(
+            title=f'Experience {i}', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=self.user, company=self.company, verified=True,
+        )
+
+    def page(self, url):
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, page):
+        return [experience['id'] for experience in page['results']]
+
+    def test_next_and_previous(self):
+        expected = list(Experience.objects.order_by('-published_date', '-id').values_list('id', flat=True))
+        first = self.page('/api/experience?page_size=10')
+        self.assertIsNone(first['previous'])
+        # New rows don't shift the pages that follow
+        new = self.add(25)
+        second = self.page(first['next'])
+        third = self.page(second['next'])
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), expected)
+        self.assertIsNone(third['next'])
+
+        back = self.page(third['previous'])
+        self.assertEqual(self.ids(back), self.ids(second))
+        back = self.page(back['previous'])
+        self.assertEqual(self.ids(back), self.ids(first))
+        # ...and going further back finds them
+        self.assertEqual(self.ids(self.page(back['previous'])), [new.id])
+
+    def test_bounded_by_default(self):
+        page = self.page('/api/experience')
+        self.assertEqual(len(page['results']), 20)
+        self.assertIsNotNone(page['next'])
+        self.assertEqual(len(self.page('/api/experience?page_size=500')['results']), 25)
+        # The whole list only when asked for
+        self.assertEqual(len(self.page('/api/experience?paginate=false')), 25)
+
+    def test_null_ordering_values(self):
+        # views 0 reads as NULL: those sort last, and cursors on them still work
+        ids = list(Experience.objects.order_by('id').values_list('id', flat=True))
+        Experience.objects.filter(pk__in=ids[::2]).update(views=3)
+        Experience.objects.filter(pk__in=ids[:4]).update(views=7)
+        queryset = Experience.objects.annotate(hits=NullIf('views', Value(0)))
+        expected = [
+            row.pk for row in sorted(queryset, key=lambda row: (row.hits is None, -(row.hits or 0), -row.pk))
+        ]
+        paginator = KeysetPagination(ordering=('-hits', '-id'))
+        request = Request(APIRequestFactory().get('/api/experience', {'page_size': 4}))
+        pages = []
+        while True:
+            pages.append([row.pk for row in paginator.paginate_queryset(queryset, request)])
+            link = paginator.get_next_link()
+            if link is None:
+                break
+            request = Request(APIRequestFactory().get(link))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(any(row.hits is None for row in paginator.page))
+
+        # Back from the last page, whose cursor holds a NULL
+        for page in reversed(pages[:-1]):
+            request = Request(APIRequestFactory().get(paginator.get_previous_link()))
+            self.assertEqual([row.pk for row in paginator.paginate_queryset(queryset, request)], page)
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_bad_cursors(self):
+        cursors = [
+            'not-a-cursor',
+            self.cursor([1, 2]),
+            self.cursor({'p': [1]}),
+            self.cursor({'p': ['garbage', 1]}),
+            self.cursor({'p': ['2025-01-01T00:00:00+00:00', 'x']}),
+            self.cursor({'p': ['2025-01-01T00:00:00+00:00', None]}),
+            self.cursor({'p': [{'a': 1}, [1]]}),
+        ]
+        for cursor in cursors:
+            response = self.client.post(f'/api/experience?cursor={cursor}', {}, format='json')
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class TagFilterTests(APITestCase):
+    # tag_match 'any' (OR, the default) or 'all' (AND) over tag_index, which
+    # has to follow every way the tags of an experience change.
+
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.web, self.ml, self.cloud = [Tag.objects.create(title=title) for title in ['web', 'ml', 'cloud']]
+        self.client.force_authenticate(self.user)
+
+    def add(self, tags):
+        experience = Experience.objects.create(
+            title='Backend interview', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=self.user, company=self.company, verified=True,
+        )
+        experience.tags.set(tags)
+        return experience
+
+    def feed(self, tags, **data):
+        response = self.client.post('/api/experience', {'tag_ids': [tag.pk for tag in tags], **data}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['results']}
+
+    def test_any_and_all(self):
+        both = self.add([self.web, self.ml])
+        web = self.add([self.web])
+        self.add([self.cloud])
+        self.assertEqual(self.feed([self.web, self.ml]), {both.pk, web.pk})
+        self.assertEqual(self.feed([self.web, self.ml], tag_match='any'), {both.pk, web.pk})
+        self.assertEqual(self.feed([self.web, self.ml], tag_match='all'), {both.pk})
+        self.assertEqual(self.feed([self.web, self.ml, self.cloud], tag_match='all'), set())
+
+        response = self.client.post(
+            '/api/experience/search', {'search': 'backend', 'tags': [self.web.pk, self.ml.pk], 'tag_match': 'all'}, format='json'
+        )
+        self.assertEqual([row['id'] for row in response.data['results']], [both.pk])
+
+    def test_index_follows_tag_changes(self):
+        experience = self.add([self.web, self.ml])
+        experience.tags.remove(self.ml)
+        self.assertEqual(self.feed([self.ml]), set())
+        # From the tag's side of the relation
+        self.cloud.experiences.add(experience)
+        self.assertEqual(self.feed([self.web, self.cloud], tag_match='all'), {experience.pk})
+        self.web.delete()
+        experience.refresh_from_db()
+        self.assertEqual(experience.tag_index, [self.cloud.pk])
+
+    def test_bad_filters(self):
+        for data in [{'tag_ids': 'web'}, {'tag_ids': ['web']}, {'tag_ids': [self.web.pk], 'tag_match': 'both'}]:
+            response = self.client.post('/api/experience', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class BulkModerateExperiencesTests(APITestCase):
+    url = '/api/experience/moderation/bulk'
+
+    def setUp(self):
+        self.author = User.objects.create(email='author@nitc.ac.in', name='Author', role='student')
+        self.follower = User.objects.create(email='follower@nitc.ac.in', name='Follower', role='student')
+        self.company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.tag = Tag.objects.create(title='web')
+        self.tag.followers.add(self.follower)
+
+    def add(self, verified=False):
+        experience = Experience.objects.create(
+            title='Experience', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=self.author, company=self.company, verified=verified,
+        )
+        experience.tags.set([self.tag])
+        return experience
+
+    def moderate(self, role, action, ids):
+        self.client.force_authenticate(User.objects.create(email=f'{role}{User.objects.count()}@nitc.ac.in', name=role, role=role))
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'action': action, 'ids': ids}, format='json')
+
+    def test_verify_outcomes_and_notification(self):
+        pending, verified = self.add(), self.add(verified=True)
+        missing = verified.pk + 100
+        response = self.moderate('pr', 'verify', [pending.pk, verified.pk, missing, pending.pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'updated': 1, 'results': [
+            {'id': pending.pk, 'status': 'verified'},
+            {'id': verified.pk, 'status': 'unchanged'},
+            {'id': missing, 'status': 'not_found'},
+        ]})
+        pending.refresh_from_db()
+        self.assertTrue(pending.verified)
+        # Followers of its tags hear about the newly verified one only
+        notifications = Notification.objects.filter(user=self.follower)
+        self.assertEqual([n.related_experience_id for n in notifications], [pending.pk])
+
+        # Again: nothing left to change, nobody notified twice
+        response = self.moderate('admin', 'verify', [pending.pk])
+        self.assertEqual(response.data['results'], [{'id': pending.pk, 'status': 'unchanged'}])
+        self.assertEqual(Notification.objects.filter(user=self.follower).count(), 1)
+
+    def test_reject(self):
+        verified, rejected = self.add(verified=True), self.add()
+        Experience.objects.filter(pk=rejected.pk).update(visibility=False)
+        response = self.moderate('spoc', 'reject', [verified.pk, rejected.pk])
+        self.assertEqual(response.data['results'], [
+            {'id': verified.pk, 'status': 'rejected'}, {'id': rejected.pk, 'status': 'unchanged'},
+        ])
+        self.assertFalse(Experience.objects.filter(visibility=True).exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_permissions(self):
+        experience = self.add(verified=True)
+        # pr may verify but not reject
+        self.assertEqual(self.moderate('pr', 'reject', [experience.pk]).status_code, 403)
+        self.assertEqual(self.moderate('student', 'verify', [experience.pk]).status_code, 403)
+        experience.refresh_from_db()
+        self.assertTrue(experience.visibility)
+
+    def test_id_cap(self):
+        self.assertEqual(self.moderate('admin', 'verify', list(range(1, 501))).status_code, 200)
+        response = self.moderate('admin', 'verify', list(range(1, 502)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'At most 500 ids per request'})
+        for ids in [[], 'not-a-list', ['x']]:
+            self.assertEqual(self.moderate('admin', 'verify', ids).status_code, 400, ids)
+        self.assertEqual(self.moderate('admin', 'publish', [1]).status_code, 400)
+
+
+class ExperienceSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student', department='CSE')
+        self.acme = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.globex = Company.objects.create(name='Globex', slug='globex', logo='', description='Globex')
+        self.client.force_authenticate(self.user)
+
+    def add(self, title, role='SDE', short_description='x', company=None, content=None, **kwargs):
+        return Experience.objects.create(
+            title=title, role=role, short_description=short_description, content=content,
+            experience_date=kwargs.pop('experience_date', date(2025, 1, 1)), job_type=kwargs.pop('job_type', 'internship'),
+            author=kwargs.pop('author', self.user), company=company or self.acme, verified=True, **kwargs,
+        )
+
+    def search(self, text, **data):
+        response = self.client.post('/api/experience/search', {'search': text, **data}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def results(self, text, **data):
+        return self.search(text, **data)['results']
+
+    def test_ranking(self):
+        # title (A) > role (B) > company name (C) > short description and content (D)
+        in_content = self.add('Interview', content={'blocks': [{'text': 'Kubernetes questions'}]})
+        in_description = self.add('Interview', short_description='Mostly kubernetes')
+        in_role = self.add('Interview', role='Kubernetes engineer')
+        in_title = self.add('Kubernetes internship')
+        self.add('Unrelated')
+        results = self.results('kubernetes')
+        self.assertEqual([row['id'] for row in results][:2], [in_title.pk, in_role.pk])
+        self.assertEqual({row['id'] for row in results[2:]}, {in_description.pk, in_content.pk})
+        ranks = [row['rank'] for row in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual([row['id'] for row in self.results('globex')], [])
+
+    def test_company_name_and_its_renames(self):
+        experience = self.add('Interview', company=self.globex)
+        self.assertEqual([row['id'] for row in self.results('globex')], [experience.pk])
+        self.globex.name = 'Initech'
+        self.globex.save()
+        self.assertEqual([row['id'] for row in self.results('initech')], [experience.pk])
+
+    def test_prefix_matching(self):
+        google = self.add('Google SDE intern', role='Software engineer', short_description='Two coding rounds')
+        self.add('Goldman Sachs analyst', role='Analyst')
+        results = self.results('goog sde')
+        self.assertEqual([row['id'] for row in results], [google.pk])
+        self.assertEqual(self.results('cod')[0]['headline'], 'Two <mark>coding</mark> rounds')
+        # Every word has to match
+        self.assertEqual(self.results('goog analyst'), [])
+
+    def test_punctuation(self):
+        experience = self.add('C++ developer at Google')
+        for text in ["c++ google", "google's", 'google & | ! ( ) :* <->', "'google'", 'developer\\']:
+            self.assertEqual([row['id'] for row in self.results(text)], [experience.pk], text)
+        # Nothing searchable left: no results rather than every experience
+        self.assertEqual(self.results('&|!:*()'), [])
+
+    def test_facets(self):
+        tag_type = TagType.objects.create(name='Domain')
+        web, ml = Tag.objects.create(title='web', type=tag_type), Tag.objects.create(title='ml', type=tag_type)
+        ee = User.objects.create(email='ee@nitc.ac.in', name='EE', role='student', department='EE')
+        first = self.add('Backend interview', job_type='internship')
+        first.tags.set([web, ml])
+        second = self.add('Backend role', company=self.globex, job_type='fulltime', author=ee, experience_date=date(2024, 6, 1))
+        second.tags.set([web])
+        self.add('Frontend interview', company=self.globex)
+        self.add('Hidden backend', visibility=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.search('backend', facets=True, tags=[web.pk])
+        facet_queries = [query for query in queries.captured_queries if 'UNION ALL' in query['sql']]
+        self.assertEqual(len(facet_queries), 1)
+        self.assertEqual({row['id'] for row in data['results']}, {first.pk, second.pk})
+        facets = data['facets']
+        self.assertEqual(facets['company'], [{'value': 'acme', 'count': 1}, {'value': 'globex', 'count': 1}])
+        self.assertEqual(facets['job_type'], [{'value': 'fulltime', 'count': 1}, {'value': 'internship', 'count': 1}])
+        self.assertEqual(facets['year'], [{'value': '2024', 'count': 1}, {'value': '2025', 'count': 1}])
+        self.assertEqual(facets['department'], [{'value': 'CSE', 'count': 1}, {'value': 'EE', 'count': 1}])
+        # The tag filter doesn't narrow the tag groups down to the filtered tag
+        self.assertEqual(facets['tags'], [{'value': str(web.pk), 'count': 2}, {'value': str(ml.pk), 'count': 1}])
+
+
+class RelatedExperienceFixtures:
+
+    def setUp(self):
+        self.author = User.objects.create(email='author@nitc.ac.in', name='Author', role='student')
+        self.acme = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.globex = Company.objects.create(name='Globex', slug='globex', logo='', description='Globex')
+        self.tags = [Tag.objects.create(title=f'tag-{i}') for i in range(4)]
+
+    def add(self, tags, company=None, job_type='internship'):
+        experience = Experience.objects.create(
+            title='Experience', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type=job_type, author=self.author, company=company or self.acme, verified=True,
+        )
+        experience.tags.set([self.tags[i] for i in tags])
+        return experience
+
+    def stored(self):
+        lists = {}
+        for row in RelatedExperience.objects.order_by('experience_id', '-score', 'related_id'):
+            lists.setdefault(row.experience_id, []).append(row.related_id)
+        return lists
+
+    def expected(self):
+        lists = {}
+        for experience in Experience.objects.filter(visibility=True, verified=True).values('id', 'tag_index', 'company_id', 'job_type'):
+            related = [related_id for _, related_id in scored_candidates(experience)[:2]]
+            if related:
+                lists[experience['id']] = related
+        return lists
+
+
+
+@mock.patch('experience.related.MAX_RELATED', 2)
+class RelatedExperienceIndexTests(RelatedExperienceFixtures, TestCase):
+    # Refreshing experiences one at a time must leave every list exactly as a
+    # from-scratch computation would, in whatever order they are refreshed.
+
+    def test_incremental_refreshes(self):
+        # x ranks e first, but e's own top two are a and b
+        e = self.add([0, 1])
+        a = self.add([0, 1])
+        b = self.add([0, 1], job_type='job')
+        x = self.add([0], company=self.globex, job_type='fulltime')
+        y = self.add([2, 3], company=self.globex)
+        for experience in [e, a, b, x, y]:
+            refresh_related(experience.pk)
+        self.assertEqual(self.stored(), self.expected())
+        self.assertIn(e.pk, self.stored()[x.pk])
+
+        # Refreshing e again must not drop it from x's list
+        refresh_related(e.pk)
+        self.assertEqual(self.stored(), self.expected())
+        self.assertIn(e.pk, self.stored()[x.pk])
+
+        # e moves away from a and b, then x moves next to y
+        e.tags.set([self.tags[2]])
+        refresh_related(e.pk)
+        self.assertEqual(self.stored(), self.expected())
+        x.tags.set([self.tags[2], self.tags[3]])
+        refresh_related(x.pk)
+        self.assertEqual(self.stored(), self.expected())
+
+        # Hidden: gone from every list, the lists it left are refilled
+        Experience.objects.filter(pk=a.pk).update(visibility=False)
+        refresh_related(a.pk)
+        self.assertEqual(self.stored(), self.expected())
+        self.assertNotIn(a.pk, RelatedExperience.objects.values_list('related_id', flat=True))
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_refreshed_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.add([0])
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.add([0])
+        self.assertEqual(self.stored(), {first.pk: [second.pk], second.pk: [first.pk]})
+        with self.captureOnCommitCallbacks(execute=True):
+            second.verified = False
+            second.save()
+        self.assertEqual(self.stored(), {})
+
+
+@mock.patch('experience.related.MAX_RELATED', 2)
+class RelatedExperienceConcurrencyTests(RelatedExperienceFixtures, TransactionTestCase):
+    # Background workers refresh experiences in parallel; overlapping refreshes
+    # touch the same lists and must not collide on unique_related_experience.
+
+    def test_overlapping_refreshes(self):
+        experiences = [self.add([0, 1]), self.add([0, 1]), self.add([0], job_type='job'), self.add([1], company=self.globex)]
+        ids = [experience.pk for experience in experiences]
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def refresh_all(order):
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    for experience_id in order:
+                        refresh_related(experience_id)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=refresh_all, args=(order,)) for order in (ids, ids[::-1])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.stored(), self.expected())
+
+
+class BackgroundJobTests(TestCase):
+    def test_runs_after_commit(self):
+        done = threading.Event()
+        with self.captureOnCommitCallbacks() as callbacks:
+            run_in_background(done.set)
+        self.assertFalse(done.is_set())
+        callbacks[0]()
+        self.assertTrue(done.wait(5))
+
+    def test_rolled_back_job_never_runs(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                run_in_background(self.fail)
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+
+    def test_failure_is_logged(self):
+        def fail():
+            raise ValueError('boom')
+
+        # What a pool thread runs: the error is logged, not raised
+        with self.assertLogs('backend.background', 'ERROR') as logs:
+            thread = threading.Thread(target=_run, args=(fail, (), {}))
+            thread.start()
+            thread.join()
+        self.assertIn('Background job fail failed', logs.output[0])
+
+
+class ViewCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='admin')
+        company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        self.experience = Experience.objects.create(
+            title='Experience', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=self.user, company=company, verified=True,
+        )
+        self.client.force_authenticate(self.user)
+        self.addCleanup(view_counter.flush)
+
+    def views(self):
+        return Experience.objects.values_list('views', flat=True).get(pk=self.experience.pk)
+
+    def test_views_written_on_flush(self):
+        for _ in range(3):
+            self.client.get(f'/api/experience/{self.experience.pk}')
+        self.assertEqual(self.views(), 0)
+        self.assertIsNotNone(view_counter._timer)
+        view_counter.flush()
+        self.assertEqual(self.views(), 3)
+        self.assertIsNone(view_counter._timer)
+        view_counter.flush()
+        self.assertEqual(self.views(), 3)
+
+    def test_counted_on_another_database(self):
+        view_counter.hit(self.experience.pk)
+        view_counter._database = 'another'
+        with self.assertLogs('experience.counters', 'WARNING'):
+            view_counter.flush()
+        self.assertEqual(self.views(), 0)
+
+    def test_save_keeps_counted_views(self):
+        experience = Experience.objects.get(pk=self.experience.pk)
+        write_views({experience.pk: 5})
+        experience.title = 'Edited'
+        experience.save()
+        response = self.client.patch(f'/api/experience/{experience.pk}', {'tips': 'Practice'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.views(), 5)
+        self.assertEqual(Experience.objects.get(pk=experience.pk).title, 'Edited')
+
+
+class ViewCounterTimerTests(TransactionTestCase):
+    # The timer thread writes on its own connection, so the data has to be committed
+
+    @override_settings(EXPERIENCE_VIEW_FLUSH_INTERVAL=0.05)
+    def test_flushed_without_further_views(self):
+        user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        company = Company.objects.create(name='Acme', slug='acme', logo='', description='Acme')
+        experience = Experience.objects.create(
+            title='Experience', role='SDE', short_description='x', experience_date=date(2025, 1, 1),
+            job_type='internship', author=user, company=company, verified=True,
+        )
+        view_counter.hit(experience.pk)
+        view_counter.hit(experience.pk)
+        timer = view_counter._timer
+        timer.join(5)
+        self.assertFalse(timer.is_alive())
+        experience.refresh_from_db()
+        self.assertEqual(experience.views, 2)
@@ -4,8 +4,11 @@ from .views import *
 urlpatterns=[
     path('',ListVerifiedExperience.as_view(),name='experience-list'),
     path('/<int:pk>',ExperienceDetail.as_view(),name='experience-detail'),
+    path('/<int:pk>/related', RelatedExperienceList.as_view(), name='related-experiences'),
     path('/create',CreateExperience.as_view(),name='experience-create'),
     path('/unverified', UnverifiedExperienceList.as_view(), name='unverified-experiences'),
+    path('/moderation', ModerationQueue.as_view(), name='experience-moderation-queue'),
+    path('/moderation/bulk', BulkModerateExperiences.as_view(), name='experience-moderation-bulk'),
     path('/self', MyExperienceList.as_view(), name='my-experiences'),
     path('/<int:pk>/save_unsave', SaveUnsaveExperience.as_view(), name='save-unsave-experience'),
     path('/saved', SavedExperiencesList.as_view(), name='saved-experiences'),
@@ -1,6 +1,11 @@
 from django.shortcuts import render
 from .models import *
 from .serializers import *
+from .counters import view_counter
+from .pagination import ExperienceCursorPagination
+from .related import schedule_related_refresh
+from .search import annotate_search, build_search_query, experience_facets
+from opportunity.fanout import notify_new_experiences
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -15,6 +20,7 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAdminUser,IsAuthenticated, BasePermission
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import PermissionDenied
+from django.db import transaction
 from django.db.models import Q
 
 class IsAdminorSPOC(BasePermission):
@@ -34,21 +40,65 @@ class IsAdminorSPOCorPR(BasePermission):
 # useful when dealing with large datasets
 
 
+def paginated_experience_response(request, queryset, ordering=None, serializer_class=ExperienceListSerializer, extra=None):
+    # A cursor page, {next, previous, results} (?page_size= up to 100, default 20).
+    # ?paginate=false returns the whole list instead, unbounded: only for clients
+    # that really need every row. Anything in extra is added next to the results
+    # (the plain list is then wrapped in {results: [...]}).
+    paginator = ExperienceCursorPagination(ordering=ordering)
+    if request.query_params.get('paginate', '').lower() in ['false', '0']:
+        queryset = queryset.order_by(*paginator.ordering)
+        serializer = serializer_class(queryset, many=True, context={'request': request})
+        if extra:
+            return Response({'results': serializer.data, **extra}, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context={'request': request})
+    return Response({**paginator.get_paginated_data(serializer.data), **(extra or {})}, status=status.HTTP_200_OK)
+
+
+def filter_by_tags(queryset, tags, match):
+    # tag_index holds each experience's tag ids, so both modes are a single GIN
+    # lookup: 'all' = contains every tag (AND), 'any' = shares at least one (OR).
+    if match == 'all':
+        return queryset.filter(tag_index__contains=tags)
+    return queryset.filter(tag_index__overlap=tags)
+
+
+def parse_tag_filter(request, key):
+    # Returns (tag ids, match mode, error response)
+    tags=request.data.get(key,[])
+    match=request.data.get('tag_match','any')
+    if not isinstance(tags, list):
+        return None, None, Response({"error": "tags must be a list"}, status=400)
+    try:
+        tags=[int(tag) for tag in tags]
+    except (TypeError, ValueError):
+        return None, None, Response({"error": "tags must be a list of tag ids"}, status=400)
+    if match not in ('any', 'all'):
+        return None, None, Response({"error": "tag_match must be 'any' or 'all'"}, status=400)
+    return tags, match, None
+
+
 class ListVerifiedExperience(APIView):
     authentication_classes=[JWTAuthentication]
     permission_classes=[IsAuthenticated]
 
     def post(self,request):
-        tags=request.data.get('tag_ids',[])
-        if not isinstance(tags, list):
-            return Response({"error": "tags must be a list"}, status=400)
+        tags, tag_match, error = parse_tag_filter(request, 'tag_ids')
+        if error:
+            return error
 
-        queryset= Experience.objects.filter(visibility=True,verified=True).distinct()
+        queryset= Experience.objects.for_list().with_saved(request.user).filter(visibility=True,verified=True)
         
         if tags:
-            queryset=queryset.filter(tags__id__in=tags).distinct()  
-        serializer = ExperienceSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data, status=200)
+            queryset=filter_by_tags(queryset, tags, tag_match)
+
+        # ?ordering=popular: most read first (time-decayed), otherwise newest first
+        if request.query_params.get('ordering') == 'popular':
+            return paginated_experience_response(request, queryset, ordering=('-popularity', '-id'))
+        return paginated_experience_response(request, queryset)
 
 class CreateExperience(generics.CreateAPIView):
     authentication_classes=[JWTAuthentication]
@@ -69,12 +119,23 @@ class ExperienceDetail(generics.RetrieveUpdateDestroyAPIView):
         user=self.request.user
         
         if user.role in ['admin','spoc']:
-            return Experience.objects.all()
+            return Experience.objects.with_related().with_saved(user)
         else:
-            return Experience.objects.filter(
+            return Experience.objects.with_related().with_saved(user).filter(
                 Q(visibility=True,verified=True) | Q(author=user)
             ).distinct()
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        view_counter.hit(kwargs['pk'])
+        return response
+
+    def perform_update(self, serializer):
+        was_verified = serializer.instance.verified
+        experience = serializer.save()
+        if experience.verified and not was_verified:
+            notify_new_experiences([experience.id], created_by=self.request.user)
+
     def perform_destroy(self,instance):
         user=self.request.user
         if user==instance.author or user.role=='admin' or user.role=='spoc':
@@ -82,22 +143,128 @@ class ExperienceDetail(generics.RetrieveUpdateDestroyAPIView):
         else:
             raise PermissionDenied("You do not have permission to delete this experience.")
 
+class RelatedExperienceList(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    default_limit = 5
+    max_limit = 20
+
+    def get(self, request, pk):
+        user = request.user
+        experiences = Experience.objects.filter(pk=pk)
+        if user.role not in ['admin', 'spoc']:
+            experiences = experiences.filter(Q(visibility=True, verified=True) | Q(author=user))
+        if not experiences.exists():
+            return Response({"error": "Experience not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        # Read straight from the precomputed index (experience, -score)
+        queryset = (
+            Experience.objects.for_list()
+            .with_saved(user)
+            .filter(related_to_entries__experience_id=pk, visibility=True, verified=True)
+            .order_by('-related_to_entries__score', 'id')[:max(limit, 0)]
+        )
+        serializer = ExperienceListSerializer(queryset, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class UnverifiedExperienceList(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAdminorSPOCorPR]
 
     def get(self, request):
-        queryset = Experience.objects.filter(verified=False)
-        serializer = ExperienceSerializer(queryset, many=True, context={'request': request})
+        queryset = Experience.objects.for_list().with_saved(request.user).filter(verified=False)
+        serializer = ExperienceListSerializer(queryset, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class ModerationQueue(APIView):
+    # Unverified experiences oldest first, so moderators work through them in the
+    # order they were posted. Always cursor paginated (?page_size=, max 100).
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminorSPOCorPR]
+
+    def get(self, request):
+        queryset = Experience.objects.for_list().with_saved(request.user).filter(verified=False, visibility=True)
+        paginator = ExperienceCursorPagination(ordering=('published_date', 'id'))
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = ExperienceListSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class BulkModerateExperiences(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminorSPOCorPR]
+
+    max_ids = 500
+    # action -> (fields it sets, roles allowed to use it). Verifying is what
+    # spoc/pr/admin can already do through PATCH; rejecting also hides the
+    # experience, which only those who can delete experiences may do.
+    actions = {
+        'verify': ({'verified': True}, ['admin', 'spoc', 'pr']),
+        'reject': ({'verified': False, 'visibility': False}, ['admin', 'spoc']),
+    }
+    outcomes = {'verify': 'verified', 'reject': 'rejected'}
+
+    def post(self, request):
+        ids = request.data.get('ids', [])
+        action = request.data.get('action')
+
+        if action not in self.actions:
+            return Response({"error": "action must be 'verify' or 'reject'"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_ids:
+            return Response({"error": f"At most {self.max_ids} ids per request"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be experience ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes, roles = self.actions[action]
+        if request.user.role not in roles:
+            raise PermissionDenied(f"You do not have permission to {action} experiences.")
+
+        with transaction.atomic():
+            current = {
+                pk: values
+                for pk, *values in Experience.objects.select_for_update()
+                .filter(id__in=ids)
+                .values_list('id', *changes.keys())
+            }
+            target = list(changes.values())
+            to_update = [pk for pk, values in current.items() if values != target]
+            if to_update:
+                Experience.objects.filter(id__in=to_update).update(**changes)
+                # update() sends no post_save, so refresh the related index here
+                schedule_related_refresh(to_update)
+                if action == 'verify':
+                    notify_new_experiences(to_update, created_by=request.user)
+
+        results = []
+        for pk in ids:
+            if pk not in current:
+                outcome = 'not_found'
+            elif pk in to_update:
+                outcome = self.outcomes[action]
+            else:
+                outcome = 'unchanged'
+            results.append({'id': pk, 'status': outcome})
+        return Response({'updated': len(to_update), 'results': results}, status=status.HTTP_200_OK)
+
+
 class MyExperienceList(generics.ListAPIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    serializer_class = ExperienceSerializer
+    serializer_class = ExperienceListSerializer
     def get_queryset(self):
-        queryset = Experience.objects.filter(author=self.request.user)
+        queryset = Experience.objects.for_list().with_saved(self.request.user).filter(author=self.request.user).order_by('-published_date')
         return queryset
 
 class SaveUnsaveExperience(APIView):
@@ -105,26 +272,20 @@ class SaveUnsaveExperience(APIView):
     permission_classes=[IsAuthenticated]
 
     def post(self,request,pk):
-        user=request.user
-
-        try:
-            experience=Experience.objects.get(pk=pk)
-        except Experience.DoesNotExist:
+        saved=Experience.objects.toggle_saved(pk, request.user)
+        if saved is None:
             return Response({"error":"Experience not found"},status=404)
-        if experience.saved_by.filter(id=user.id).exists():
-            experience.saved_by.remove(user)
-            return Response({"message":"Experience unsaved"},status=200)
-        else:
-            experience.saved_by.add(user)
-            return Response({"message":"Experience saved"},status=200)
+        if saved:
+            return Response({"message":"Experience saved","is_saved":True},status=200)
+        return Response({"message":"Experience unsaved","is_saved":False},status=200)
 
 class SavedExperiencesList(generics.ListAPIView):
     authentication_classes=[JWTAuthentication]
     permission_classes=[IsAuthenticated]
-    serializer_class=ExperienceSerializer
+    serializer_class=ExperienceListSerializer
 
     def get_queryset(self):
-        return self.request.user.saved_experiences.all().order_by('-id')
+        return self.request.user.saved_experiences.for_list().with_saved(self.request.user).order_by('-id')
 
 
 class ExperienceSearch(APIView):
@@ -140,21 +301,21 @@ class ExperienceSearch(APIView):
         department = request.data.get('department', '')
         offer_type = request.data.get('offerType', '')
         verified = request.data.get('verified', '')
-        tags = request.data.get('tags', [])
+        tags, tag_match, error = parse_tag_filter(request, 'tags')
+        if error:
+            return error
         date_range = request.data.get('dateRange', {})
 
         # Start with verified and visible experiences
-        queryset = Experience.objects.filter(visibility=True, verified=True)
+        queryset = Experience.objects.for_list().with_saved(request.user).filter(visibility=True, verified=True)
 
         # Apply filters
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(role__icontains=search_query) |
-                Q(short_description__icontains=search_query) |
-                Q(company__name__icontains=search_query) |
-                Q(author__name__icontains=search_query)
-            )
+        query = build_search_query(search_query) if search_query else None
+        if search_query and query is None:
+            # Nothing searchable in the text (only punctuation)
+            queryset = queryset.none()
+        if query is not None:
+            queryset = annotate_search(queryset, query)
 
         if company:
             queryset = queryset.filter(company__slug=company)
@@ -177,7 +338,7 @@ class ExperienceSearch(APIView):
             queryset = queryset.filter(verified=False)
 
         if tags:
-            queryset = queryset.filter(tags__id__in=tags).distinct()
+            queryset = filter_by_tags(queryset, tags, tag_match)
 
         if date_range.get('start'):
             from datetime import datetime
@@ -189,11 +350,17 @@ class ExperienceSearch(APIView):
             end_date = datetime.strptime(date_range['end'], '%Y-%m-%d').date()
             queryset = queryset.filter(experience_date__lte=end_date)
 
-        # Order by published date
-        queryset = queryset.order_by('-published_date')
+        # Facet counts for the current filters, all in one query
+        extra = None
+        if request.data.get('facets'):
+            extra = {'facets': experience_facets(queryset)}
 
-        serializer = ExperienceSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Best matches first when searching, otherwise newest first
+        if query is not None:
+            return paginated_experience_response(
+                request, queryset, ordering=('-rank', '-id'), serializer_class=ExperienceSearchSerializer, extra=extra
+            )
+        return paginated_experience_response(request, queryset, extra=extra)
 
 
 class ExperienceAnalytics(APIView):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Opportunity, Notification
+from .models import Opportunity, Notification, NotificationFanout
 
 @admin.register(Opportunity)
 class OpportunityAdmin(admin.ModelAdmin):
@@ -13,3 +13,10 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'notification_type', 'is_read', 'created_date']
     list_filter = ['notification_type', 'is_read', 'created_date']
     search_fields = ['title', 'message', 'user__name']
+
+@admin.register(NotificationFanout)
+class NotificationFanoutAdmin(admin.ModelAdmin):
+    list_display = ['title', 'notification_type', 'status', 'created_count', 'created_by', 'created_date']
+    list_filter = ['notification_type', 'status', 'created_date']
+    search_fields = ['title', 'message']
+    readonly_fields = ['last_user_id', 'created_count', 'created_date', 'updated_date', 'completed_date']
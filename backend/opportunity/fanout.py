@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from backend.background import run_in_background
+from experience.models import Experience
+from tag.models import Tag
+from user.models import User
+
+from .models import Notification, NotificationFanout
+
+CHUNK_SIZE = 1000
+
+# audience key -> User lookup it narrows on. Keys are ANDed together, values
+# within a key are ORed: {"roles": ["student"], "departments": ["CSE", "EE"]}
+# is every CSE or EE student.
+AUDIENCE_FILTERS = {
+    'roles': 'role__in',
+    'departments': 'department__in',
+    'programmes': 'programme__in',
+    'user_ids': 'id__in',
+}
+
+
+def audience_queryset(audience):
+    users = User.objects.filter(is_active=True)
+    for key, lookup in AUDIENCE_FILTERS.items():
+        if audience.get(key):
+            users = users.filter(**{lookup: audience[key]})
+    if audience.get('tags'):
+        # Exists rather than a join, a user following several of the tags
+        # must still only get one notification
+        users = users.filter(Exists(
+            Tag.followers.through.objects.filter(user_id=OuterRef('pk'), tag_id__in=audience['tags'])
+        ))
+    return users
+
+
+def start_fanout(**fields):
+    job = NotificationFanout.objects.create(**fields)
+    run_in_background(run_fanout, job.pk)
+    return job
+
+
+def fanout_now(chunk_size=CHUNK_SIZE, **fields):
+    # Like start_fanout, but runs in the caller and in one transaction: either
+    # every notification is created or none is.
+    with transaction.atomic():
+        job = NotificationFanout.objects.create(**fields)
+        return run_fanout(job.pk, chunk_size=chunk_size)
+
+
+def run_fanout(job_id, chunk_size=CHUNK_SIZE):
+    # Every chunk is its own transaction: the notifications and the new
+    # last_user_id are committed together, so a crash loses at most the chunk
+    # in flight and the job can simply be run again. The row lock (skip_locked)
+    # keeps two workers from writing the same chunk twice.
+    while True:
+        with transaction.atomic():
+            job = (
+                NotificationFanout.objects.select_for_update(skip_locked=True)
+                .filter(pk=job_id, status__in=['pending', 'running'])
+                .first()
+            )
+            if job is None:
+                return None
+
+            user_ids = list(
+                audience_queryset(job.audience)
+                .filter(id__gt=job.last_user_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                job.status = 'completed'
+                job.completed_date = timezone.now()
+                job.save(update_fields=['status', 'completed_date', 'updated_date'])
+                return job
+
+            Notification.objects.create_many(
+                [
+                    Notification(
+                        user_id=user_id,
+                        title=job.title,
+                        message=job.message,
+                        notification_type=job.notification_type,
+                        related_opportunity_id=job.related_opportunity_id,
+                        related_experience_id=job.related_experience_id,
+                        related_mentorship_id=job.related_mentorship_id,
+                    )
+                    for user_id in user_ids
+                ],
+                batch_size=chunk_size,
+            )
+            job.status = 'running'
+            job.last_user_id = user_ids[-1]
+            job.created_count += len(user_ids)
+            job.save(update_fields=['status', 'last_user_id', 'created_count', 'updated_date'])
+
+
+def notify_new_opportunity(opportunity, created_by=None):
+    tag_ids = list(opportunity.tags.values_list('id', flat=True))
+    if not tag_ids:
+        return None
+    return start_fanout(
+        title=f"New opportunity: {opportunity.title}"[:200],
+        message=opportunity.description[:500],
+        notification_type='opportunity',
+        related_opportunity=opportunity,
+        audience={'tags': tag_ids},
+        created_by=created_by,
+    )
+
+
+def notify_new_experiences(experience_ids, created_by=None):
+    # One job per experience, each goes to the followers of its own tags
+    experiences = Experience.objects.filter(id__in=experience_ids).only('id', 'title', 'short_description', 'tag_index')
+    jobs = []
+    for experience in experiences:
+        if not experience.tag_index:
+            continue
+        jobs.append(start_fanout(
+            title=f"New experience: {experience.title}"[:200],
+            message=(experience.short_description or '')[:500],
+            notification_type='experience',
+            related_experience=experience,
+            audience={'tags': experience.tag_index},
+            created_by=created_by,
+        ))
+    return jobs
@@ -0,0 +1,173 @@
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import TextField, Value
+from django.db.models.functions import MD5, Cast, Concat
+from django.utils import timezone
+
+from .models import BOOKED_STATUSES, Mentorship, Opportunity
+
+PRODID = '-//GDSC NITC//Experience Portal Calendar//EN'
+
+# Past mentorship sessions older than this are left out of the feed
+MENTORSHIP_HISTORY = timedelta(days=90)
+
+
+def escape(text):
+    # RFC 5545 TEXT escaping
+    return (
+        (text or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    # Lines longer than 75 octets continue on the next line after a space
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        chunk = encoded[:limit]
+        # Don't cut a multi-byte character in half
+        while True:
+            try:
+                text = chunk.decode()
+                break
+            except UnicodeDecodeError:
+                chunk = chunk[:-1]
+        parts.append(text)
+        encoded = encoded[len(chunk):]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event(uid, start, end, summary, description='', url=None, location=None, updated=None, status=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{format_datetime(updated or timezone.now())}',
+        f'DTSTART:{format_datetime(start)}',
+        f'DTEND:{format_datetime(end)}',
+        f'SUMMARY:{escape(summary)}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{escape(description)}')
+    if location:
+        lines.append(f'LOCATION:{escape(location)}')
+    if url:
+        lines.append(f'URL:{url}')
+    if status:
+        lines.append(f'STATUS:{status}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def calendar_lines(name, events):
+    # Yields the calendar piece by piece so the response can stream it
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold(f'PRODID:{PRODID}')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold(f'X-WR-CALNAME:{escape(name)}')
+    for item in events:
+        yield item
+    yield fold('END:VCALENDAR')
+
+
+def opportunity_events(queryset, host):
+    for opportunity in queryset.iterator(chunk_size=500):
+        yield event(
+            uid=f'opportunity-{opportunity.id}@{host}',
+            start=opportunity.application_deadline,
+            end=opportunity.application_deadline,
+            summary=f'Deadline: {opportunity.title}',
+            description=opportunity.description,
+            url=opportunity.application_link,
+            location=opportunity.location,
+            updated=opportunity.updated_date,
+        )
+
+
+def mentorship_events(queryset, host):
+    statuses = {'pending': 'TENTATIVE', 'active': 'CONFIRMED', 'completed': 'CONFIRMED'}
+    for session in queryset.iterator(chunk_size=500):
+        yield event(
+            uid=f'mentorship-{session.id}@{host}',
+            start=session.start_date,
+            end=session.end_date or session.start_date,
+            summary=f'Mentorship: {session.title}',
+            description=session.description,
+            url=session.meeting_link,
+            updated=session.updated_date,
+            status=statuses.get(session.status),
+        )
+
+
+async def iterate_in_thread(iterator, chunk_size=100):
+    # Serves a sync iterator (which queries the database) to the ASGI handler
+    # a chunk at a time. thread_sensitive keeps every chunk on the same thread,
+    # and so on the connection holding the queryset's server-side cursor.
+    next_chunk = sync_to_async(lambda: list(islice(iterator, chunk_size)), thread_sensitive=True)
+    while True:
+        chunk = await next_chunk()
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
+
+
+class Feed:
+    # One .ics feed: the rows it lists, how to turn them into events, and an
+    # ETag computed by one aggregate over the same rows. The aggregate is all a
+    # client polling an unchanged feed costs.
+    def __init__(self, name, queryset, events):
+        self.name = name
+        self.queryset = queryset
+        self.events = events
+
+    def etag(self):
+        # md5 of the feed's (id, updated_date) pairs in id order, digested in
+        # SQL: it changes when a row is updated and when rows join or leave the
+        # feed without being updated (unsaving, a deadline passing). There is
+        # no Last-Modified for the same reason, no date moves when a row leaves.
+        row = Concat(Cast('id', TextField()), Value(':'), Cast('updated_date', TextField()), output_field=TextField())
+        digest = self.queryset.order_by().aggregate(digest=MD5(StringAgg(row, Value(','), order_by='id')))['digest']
+        return '"%s"' % hashlib.md5(f'{self.name}:{digest}'.encode()).hexdigest()
+
+    def stream(self, host):
+        return calendar_lines(self.name, self.events(self.queryset, host))
+
+
+def user_feed(kind, user):
+    now = timezone.now()
+    if kind == 'saved':
+        queryset = Opportunity.objects.filter(
+            saved_by=user, visibility=True, application_deadline__isnull=False
+        ).order_by('application_deadline', 'id')
+        return Feed('Saved opportunities', queryset, opportunity_events)
+    if kind == 'deadlines':
+        queryset = Opportunity.objects.filter(
+            visibility=True, application_deadline__gte=now
+        ).order_by('application_deadline', 'id')
+        return Feed('Upcoming deadlines', queryset, opportunity_events)
+    if kind == 'mentorships':
+        queryset = Mentorship.objects.involving(user).filter(
+            status__in=[*BOOKED_STATUSES, 'completed'], start_date__gte=now - MENTORSHIP_HISTORY
+        ).order_by('start_date', 'id')
+        return Feed('Mentorship sessions', queryset, mentorship_events)
+    return None
+
+
+FEEDS = ['saved', 'deadlines', 'mentorships']
@@ -0,0 +1,190 @@
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from company.models import Company
+from tag.models import Tag
+
+from .models import Opportunity
+from .serializers import OpportunityImportSerializer
+
+BATCH_SIZE = 500
+
+FORMATS = ['csv', 'jsonl', 'json']
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def detect_file_type(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in FORMATS:
+        raise ImportFileError(f'Unsupported file type, expected one of: {", ".join(FORMATS)}.')
+    return extension
+
+
+def csv_rows(lines):
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+    for row in reader:
+        # Spreadsheets export missing values as empty cells
+        yield reader.line_num, {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+
+
+def jsonl_rows(lines):
+    for number, line in enumerate(codecs.iterdecode(lines, 'utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def json_rows(lines):
+    # A JSON array can't be read row by row, the whole file is loaded
+    try:
+        rows = json.loads(b''.join(lines).decode('utf-8-sig'))
+    except ValueError as e:
+        raise ImportFileError(f'Invalid JSON: {e}')
+    if not isinstance(rows, list):
+        raise ImportFileError('Expected a JSON array of opportunities.')
+    yield from enumerate(rows, start=1)
+
+
+READERS = {'csv': csv_rows, 'jsonl': jsonl_rows, 'json': json_rows}
+
+
+def read_rows(lines, file_type):
+    # (row number, dict) pairs; a row that could not be parsed comes as
+    # (row number, exception). tags may also be given as one "a, b; c" string.
+    try:
+        for number, data in READERS[file_type](lines):
+            if isinstance(data, dict) and isinstance(data.get('tags'), str):
+                data['tags'] = [title for title in data['tags'].replace(';', ',').split(',') if title.strip()]
+            yield number, data
+    except UnicodeDecodeError:
+        raise ImportFileError('The file is not UTF-8 encoded.')
+    except csv.Error as e:
+        raise ImportFileError(f'Invalid CSV: {e}')
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class OpportunityImporter:
+    # Imports opportunities from an iterable of rows, batch by batch. Company
+    # slugs and tag titles are resolved from maps filled with one query each
+    # per batch (only for keys not seen before), every row is validated on its
+    # own, and the valid rows of a batch are written with one bulk insert into
+    # opportunities and one into the tags through table. Invalid rows are
+    # reported and skipped, they don't stop the import.
+    def __init__(self, created_by, batch_size=BATCH_SIZE, dry_run=False):
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.companies = {}
+        self.tags = {}
+        self.rows = 0
+        self.valid = 0
+        self.created = []
+        self.errors = []
+        self.file_error = None
+
+    def run(self, rows):
+        for batch in batches(self.readable(rows), self.batch_size):
+            self.import_batch(batch)
+        return self.report()
+
+    def readable(self, rows):
+        # A file that turns out unreadable part way (bad encoding, broken CSV)
+        # ends the rows there: the ones read before are still imported and the
+        # report says why it stopped in file_error.
+        try:
+            yield from rows
+        except ImportFileError as e:
+            self.file_error = str(e)
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'valid': self.valid,
+            'created': len(self.created),
+            'failed': len(self.errors),
+            'dry_run': self.dry_run,
+            'ids': self.created,
+            'errors': self.errors,
+            'file_error': self.file_error,
+        }
+
+    def load_lookups(self, batch):
+        slugs, titles = set(), set()
+        for _, data in batch:
+            if not isinstance(data, dict):
+                continue
+            if isinstance(data.get('company'), str):
+                slugs.add(data['company'].strip())
+            if isinstance(data.get('tags'), list):
+                titles.update(title.strip().lower() for title in data['tags'] if isinstance(title, str))
+        slugs -= self.companies.keys()
+        titles -= self.tags.keys()
+        if slugs:
+            self.companies.update(Company.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+        if titles:
+            self.tags.update(
+                Tag.objects.annotate(key=Lower('title')).filter(key__in=titles).values_list('key', 'id')
+            )
+
+    def import_batch(self, batch):
+        self.load_lookups(batch)
+        context = {'companies': self.companies, 'tags': self.tags}
+        opportunities, tag_ids = [], []
+        for number, data in batch:
+            self.rows += 1
+            if isinstance(data, Exception):
+                self.errors.append({'row': number, 'errors': {'non_field_errors': [str(data)]}})
+                continue
+            if not isinstance(data, dict):
+                self.errors.append({'row': number, 'errors': {'non_field_errors': ['Expected an object.']}})
+                continue
+            serializer = OpportunityImportSerializer(data=data, context=context)
+            if not serializer.is_valid():
+                self.errors.append({'row': number, 'errors': serializer.errors})
+                continue
+            fields = dict(serializer.validated_data)
+            tag_ids.append(fields.pop('tags', []))
+            opportunities.append(Opportunity(
+                company_id=fields.pop('company', None), created_by=self.created_by, **fields
+            ))
+        self.valid += len(opportunities)
+
+        if self.dry_run or not opportunities:
+            return
+        with transaction.atomic():
+            Opportunity.objects.bulk_create(opportunities)
+            Through = Opportunity.tags.through
+            Through.objects.bulk_create([
+                Through(opportunity_id=opportunity.id, tag_id=tag_id)
+                for opportunity, tags in zip(opportunities, tag_ids)
+                for tag_id in tags
+            ])
+        self.created.extend(opportunity.id for opportunity in opportunities)
+
+
+def import_opportunities(lines, file_type, created_by, batch_size=BATCH_SIZE, dry_run=False):
+    # lines: the file as an iterable of byte lines (an open binary file or an
+    # upload). When the file itself can't be read the report's file_error says
+    # why; batches written before that point stay written and are in ids.
+    importer = OpportunityImporter(created_by, batch_size=batch_size, dry_run=dry_run)
+    return importer.run(read_rows(lines, file_type))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from opportunity.models import Notification
+from opportunity.retention import (
+    archive_batch, drop_archive_partitions, months_before, retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves read notifications older than the retention period (NOTIFICATION_RETENTION_DAYS, '
+        'default 90) from the live table into the monthly partitioned archive, or deletes them '
+        'with --drop. Works in small batches, each in its own short transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention period in days, overrides the setting')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Notifications moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches')
+        parser.add_argument('--drop', action='store_true', help='Delete old notifications instead of archiving them')
+        parser.add_argument(
+            '--purge-archive-months', type=int,
+            help='Also drop archive partitions for months older than this many months',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many would be moved')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        expired = Notification.objects.filter(is_read=True, created_date__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} read notifications older than {cutoff:%Y-%m-%d} would be moved')
+            return
+
+        moved = batches = 0
+        while True:
+            count = archive_batch(cutoff, options['batch_size'], drop=options['drop'])
+            if not count:
+                break
+            moved += count
+            batches += 1
+            time.sleep(options['pause'])
+        action = 'Deleted' if options['drop'] else 'Archived'
+        self.stdout.write(f'{action} {moved} notifications in {batches} batches')
+
+        if options['purge_archive_months'] is not None:
+            before = months_before(timezone.now(), options['purge_archive_months'])
+            for name in drop_archive_partitions(before):
+                self.stdout.write(f'Dropped archive partition {name}')
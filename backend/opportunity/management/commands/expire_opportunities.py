@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from opportunity.models import Opportunity
+
+
+class Command(BaseCommand):
+    help = (
+        'Hides visible opportunities whose application deadline has passed. Works in small '
+        'batches, each in its own short transaction, skipping rows locked by someone else, '
+        'so it can run alongside the API (once from cron, or continuously with --loop).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Opportunities hidden per transaction')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches')
+        parser.add_argument('--loop', action='store_true', help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300, help='Seconds between sweeps with --loop')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many would be hidden')
+
+    def handle(self, *args, **options):
+        while True:
+            if options['dry_run']:
+                count = self.expired(timezone.now()).count()
+                self.stdout.write(f'{count} expired opportunities would be hidden')
+                return
+
+            started = time.monotonic()
+            hidden, batches = self.sweep(options['batch_size'], options['pause'])
+            self.stdout.write(
+                f'{timezone.now():%Y-%m-%d %H:%M:%S} hid {hidden} expired opportunities '
+                f'in {batches} batches ({time.monotonic() - started:.1f}s)'
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def expired(self, now):
+        return Opportunity.objects.filter(visibility=True, application_deadline__lt=now)
+
+    def sweep(self, batch_size, pause):
+        now = timezone.now()
+        hidden = batches = 0
+        while True:
+            with transaction.atomic():
+                # Walks the partial index on application_deadline WHERE visibility
+                ids = list(
+                    self.expired(now)
+                    .select_for_update(skip_locked=True)
+                    .order_by('application_deadline')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    return hidden, batches
+                # update() skips auto_now, keep updated_date in step with the change
+                hidden += Opportunity.objects.filter(id__in=ids).update(visibility=False, updated_date=now)
+            batches += 1
+            if pause:
+                time.sleep(pause)
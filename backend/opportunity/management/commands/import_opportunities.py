@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from opportunity.importer import BATCH_SIZE, FORMATS, ImportFileError, detect_file_type, import_opportunities
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports opportunities from a CSV, JSON Lines or JSON file. Companies are given by '
+        'slug and tags by title. Invalid rows are reported and skipped; valid rows are '
+        'inserted in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--created-by', required=True, help='Email of the user the opportunities are created by')
+        parser.add_argument('--format', choices=FORMATS, help='File type, by default taken from the extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows inserted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the rows')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['created_by']).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['created_by']}")
+
+        try:
+            kind = options['format'] or detect_file_type(options['path'])
+            with open(options['path'], 'rb') as lines:
+                report = import_opportunities(
+                    lines, kind, created_by=user, batch_size=options['batch_size'], dry_run=options['dry_run']
+                )
+        except (ImportFileError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        if report['dry_run']:
+            self.stdout.write(f"{report['rows']} rows: {report['valid']} valid, {report['failed']} failed")
+        else:
+            self.stdout.write(f"{report['rows']} rows: {report['created']} created, {report['failed']} failed")
+        if report['file_error']:
+            raise CommandError(report['file_error'])
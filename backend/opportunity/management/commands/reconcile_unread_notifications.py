@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from opportunity.models import UnreadNotificationCount
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Recounts unread notifications and repairs the per-user unread counters where they '
+        'drifted (for example after notifications were removed by a cascade delete). Works '
+        'through the users in batches, each in its own short transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users recounted per transaction')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            fixed += len(UnreadNotificationCount.objects.reconcile(user_ids))
+            checked += len(user_ids)
+            last_id = user_ids[-1]
+            time.sleep(options['pause'])
+        self.stdout.write(f'Checked {checked} users, fixed {fixed} unread counters')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from opportunity.fanout import CHUNK_SIZE, run_fanout
+from opportunity.models import NotificationFanout
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs notification fan-out jobs that have not finished, e.g. because the process '
+        'running them was restarted. Jobs continue from the last user they reached, so '
+        'nobody is notified twice.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, action='append', help='Only run this job (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Notifications written per transaction')
+
+    def handle(self, *args, **options):
+        jobs = NotificationFanout.objects.filter(status__in=['pending', 'running']).order_by('pk')
+        if options['job']:
+            jobs = jobs.filter(pk__in=options['job'])
+
+        for job_id in jobs.values_list('pk', flat=True):
+            job = run_fanout(job_id, chunk_size=options['chunk_size'])
+            if job is None:
+                self.stdout.write(f'Job {job_id} is being run elsewhere, skipped')
+            else:
+                self.stdout.write(f'Job {job_id}: {job.created_count} notifications')
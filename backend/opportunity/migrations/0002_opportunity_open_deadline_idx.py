@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_company_logo_variants'),
+        ('opportunity', '0001_initial'),
+        ('tag', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(condition=models.Q(('visibility', True)), fields=['application_deadline'], name='opportunity_open_deadline_idx'),
+        ),
+    ]
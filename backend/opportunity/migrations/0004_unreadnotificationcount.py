@@ -0,0 +1,31 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunity', '0003_notificationfanout'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadNotificationCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_notification_count', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO opportunity_unreadnotificationcount (user_id, count)
+            SELECT user_id, count(*) FROM opportunity_notification
+            WHERE NOT is_read GROUP BY user_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
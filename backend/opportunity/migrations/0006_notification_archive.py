@@ -0,0 +1,70 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Django can't create partitioned tables, so the table is created by hand; the
+# state operations describe the same table to the ORM. The primary key has to
+# include the partition key. Monthly partitions are created by
+# opportunity.retention before rows are moved in.
+CREATE_ARCHIVE_SQL = """
+    CREATE TABLE opportunity_archivednotification (
+        id bigint NOT NULL,
+        title varchar(200) NOT NULL,
+        message text NOT NULL,
+        notification_type varchar(20) NOT NULL,
+        is_read boolean NOT NULL,
+        user_id bigint NOT NULL,
+        related_opportunity_id bigint NULL,
+        related_experience_id bigint NULL,
+        related_mentorship_id bigint NULL,
+        created_date timestamp with time zone NOT NULL,
+        archived_date timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, created_date)
+    ) PARTITION BY RANGE (created_date);
+    CREATE INDEX archived_notification_user_idx
+        ON opportunity_archivednotification (user_id, created_date DESC, id DESC);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experience', '0010_experience_views_popularity'),
+        ('opportunity', '0005_notification_inbox_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', True)), fields=['created_date'], name='notification_read_created_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_ARCHIVE_SQL, 'DROP TABLE opportunity_archivednotification'),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedNotification',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('title', models.CharField(max_length=200)),
+                        ('message', models.TextField()),
+                        ('notification_type', models.CharField(choices=[('opportunity', 'New Opportunity'), ('experience', 'New Experience'), ('mentorship', 'Mentorship Update'), ('verification', 'Verification Required'), ('system', 'System Notification')], max_length=20)),
+                        ('is_read', models.BooleanField(default=True)),
+                        ('created_date', models.DateTimeField()),
+                        ('archived_date', models.DateTimeField()),
+                        ('related_experience', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='experience.experience')),
+                        ('related_mentorship', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='opportunity.mentorship')),
+                        ('related_opportunity', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='opportunity.opportunity')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['user', '-created_date', '-id'], name='archived_notification_user_idx')],
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Roles listed by available_mentors before mentor profiles existed (frozen here)
+MENTOR_ROLES = ['student', 'spoc', 'pr', 'admin']
+
+
+def create_mentor_profiles(apps, schema_editor):
+    # The directory now only lists profiles: give everyone it listed before one,
+    # so it isn't empty after the deploy. Users can remove theirs or set
+    # is_available off.
+    User = apps.get_model('user', 'User')
+    MentorProfile = apps.get_model('opportunity', 'MentorProfile')
+    users = User.objects.filter(role__in=MENTOR_ROLES).order_by('pk')
+    MentorProfile.objects.bulk_create(
+        (
+            MentorProfile(user_id=user_id, department=department, programme=programme)
+            for user_id, department, programme in users.values_list('pk', 'department', 'programme').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunity', '0006_notification_archive'),
+        ('tag', '0002_tag_followers'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentorProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mentor_profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('department', models.CharField(blank=True, max_length=100, null=True)),
+                ('programme', models.CharField(blank=True, max_length=100, null=True)),
+                ('bio', models.TextField(blank=True, default='')),
+                ('is_available', models.BooleanField(default=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('expertise', models.ManyToManyField(blank=True, related_name='mentors', to='tag.tag')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_available', True)), fields=['department', 'programme'], name='mentor_available_idx')],
+            },
+        ),
+        migrations.RunPython(create_mentor_profiles, migrations.RunPython.noop),
+    ]
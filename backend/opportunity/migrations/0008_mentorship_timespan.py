@@ -0,0 +1,71 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:15
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.functions.comparison
+import opportunity.models
+from django.conf import settings
+from django.db import migrations, models
+
+# Sessions without an end_date get the default length MentorshipSerializer
+# gives new ones (frozen here). Left NULL they would become empty ranges that
+# overlap nothing, and the constraints below would never see them.
+BACKFILL_END_DATE_SQL = "UPDATE opportunity_mentorship SET end_date = start_date + interval '1 hour' WHERE end_date IS NULL"
+
+BOOKED_STATUSES = ['pending', 'active']
+
+
+def cancel_double_bookings(apps, schema_editor):
+    # The exclusion constraints can't be added while booked sessions overlap.
+    # Sessions are kept first come, first served (by id): a pending/active
+    # session overlapping an earlier kept one of its mentor or mentee is set to
+    # 'cancelled'. Overlap follows the [start, end) ranges of timespan.
+    Mentorship = apps.get_model('opportunity', 'Mentorship')
+    kept = {}
+    cancelled = []
+    sessions = (
+        Mentorship.objects.filter(status__in=BOOKED_STATUSES)
+        .order_by('id')
+        .values_list('id', 'mentor_id', 'mentee_id', 'start_date', 'end_date')
+    )
+    for session_id, mentor_id, mentee_id, start, end in sessions.iterator():
+        end = max(end, start)
+        if end == start:
+            continue
+        spans = [*kept.get(('mentor', mentor_id), []), *kept.get(('mentee', mentee_id), [])]
+        if any(start < other_end and other_start < end for other_start, other_end in spans):
+            cancelled.append(session_id)
+            continue
+        kept.setdefault(('mentor', mentor_id), []).append((start, end))
+        kept.setdefault(('mentee', mentee_id), []).append((start, end))
+    for offset in range(0, len(cancelled), 1000):
+        Mentorship.objects.filter(id__in=cancelled[offset:offset + 1000]).update(status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunity', '0007_mentorprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(BACKFILL_END_DATE_SQL, migrations.RunSQL.noop),
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        # Fire the deferred foreign key checks of the updates now, Postgres
+        # refuses ALTER TABLE while they are pending
+        migrations.RunSQL('SET CONSTRAINTS ALL IMMEDIATE', migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name='mentorship',
+            name='timespan',
+            field=models.GeneratedField(db_persist=True, expression=opportunity.models.TsTzRange('start_date', django.db.models.functions.comparison.Greatest('end_date', 'start_date')), output_field=django.contrib.postgres.fields.ranges.DateTimeRangeField()),
+        ),
+        migrations.AddConstraint(
+            model_name='mentorship',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ['pending', 'active'])), expressions=[(opportunity.models.Int8Range('mentor_id', 'mentor_id', models.Value('[]')), '&&'), ('timespan', '&&')], name='mentorship_mentor_no_overlap', violation_error_message='The mentor already has a session at this time.'),
+        ),
+        migrations.AddConstraint(
+            model_name='mentorship',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ['pending', 'active'])), expressions=[(opportunity.models.Int8Range('mentee_id', 'mentee_id', models.Value('[]')), '&&'), ('timespan', '&&')], name='mentorship_mentee_no_overlap', violation_error_message='The mentee already has a session at this time.'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 18:18
+
+import django.db.models.deletion
+import opportunity.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunity', '0008_mentorship_timespan'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeedToken',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calendar_feed_token', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('token', models.CharField(default=opportunity.models.new_feed_token, max_length=64, unique=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,10 +1,58 @@
-from django.db import models
+import secrets
+from collections import Counter
+
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce, Greatest
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import BigIntegerRangeField, DateTimeRangeField, RangeOperators
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange, NumericRange
+from django.dispatch import Signal
 from user.models import User
 from company.models import Company
 from tag.models import Tag
 
 # Create your models here.
 
+# The inserted value is clamped at 0 (the count column can't go negative, even
+# in a row that only conflicts), the update applies the real delta.
+ADJUST_UNREAD_SQL = """
+    WITH d (user_id, delta) AS (SELECT * FROM unnest(%(users)s::bigint[], %(deltas)s::integer[]))
+    INSERT INTO {counter} AS c (user_id, count)
+    SELECT user_id, GREATEST(delta, 0) FROM d
+    ON CONFLICT (user_id) DO UPDATE
+        SET count = GREATEST(c.count + (SELECT delta FROM d WHERE d.user_id = EXCLUDED.user_id), 0)
+"""
+
+RECONCILE_UNREAD_SQL = """
+    INSERT INTO {counter} AS c (user_id, count)
+    SELECT u.id, count(n.id)
+    FROM {user} AS u LEFT JOIN {notification} AS n ON n.user_id = u.id AND NOT n.is_read
+    WHERE u.id = ANY(%(users)s)
+    GROUP BY u.id
+    HAVING count(n.id) > 0 OR EXISTS (SELECT 1 FROM {counter} WHERE user_id = u.id)
+    ON CONFLICT (user_id) DO UPDATE SET count = EXCLUDED.count WHERE c.count <> EXCLUDED.count
+    RETURNING c.user_id
+"""
+
+def new_feed_token():
+    return secrets.token_urlsafe(32)
+
+# Sessions in these states take up the mentor's and mentee's time
+BOOKED_STATUSES = ['pending', 'active']
+
+# Match score for MentorProfile.objects.matched_for: same department and
+# programme, plus this much per expertise tag the mentee follows
+MENTOR_MATCH_WEIGHTS = {'department': 2.0, 'programme': 1.0, 'tags': 1.5}
+
+class OpportunityQuerySet(models.QuerySet):
+    def with_related(self):
+        # Everything OpportunitySerializer nests: created_by, verified_by and company
+        # are joined in, tags (with their type) come in one extra query.
+        return self.select_related('created_by', 'verified_by', 'company').prefetch_related(
+            models.Prefetch('tags', queryset=Tag.objects.select_related('type'))
+        )
+
+
 class Opportunity(models.Model):
     OPPORTUNITY_TYPES = [
         ('internship', 'Internship'),
@@ -41,10 +89,65 @@ class Opportunity(models.Model):
     verified_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='verified_opportunities')
     tags = models.ManyToManyField(Tag, related_name='opportunities', blank=True)
     saved_by = models.ManyToManyField(User, related_name='saved_opportunities', blank=True)
+
+    objects = OpportunityQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the "closing soon" views (upcoming, ?ordering=deadline)
+            models.Index(
+                fields=['application_deadline'],
+                condition=models.Q(visibility=True),
+                name='opportunity_open_deadline_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.opportunity_type}"
 
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class Int8Range(models.Func):
+    function = 'INT8RANGE'
+    output_field = BigIntegerRangeField()
+
+
+def participant(field):
+    # mentor_id/mentee_id as the one-value range [id, id]. GiST indexes ranges
+    # out of the box, so the exclusion constraints below can compare users with
+    # && instead of = and don't need the btree_gist extension.
+    return Int8Range(field, field, models.Value('[]'))
+
+
+class MentorshipQuerySet(models.QuerySet):
+    def booked(self):
+        return self.filter(status__in=BOOKED_STATUSES)
+
+    def overlapping(self, start, end):
+        return self.filter(timespan__overlap=DateTimeTZRange(start, end))
+
+    # Written against the same expressions as the exclusion constraints so the
+    # GiST indexes behind them serve "this user's booked sessions in this
+    # window". Those indexes only hold booked sessions: combine with booked().
+    def for_mentor(self, user_id):
+        return self.alias(mentor_range=participant('mentor_id')).filter(
+            mentor_range__overlap=NumericRange(user_id, user_id, '[]')
+        )
+
+    def for_mentee(self, user_id):
+        return self.alias(mentee_range=participant('mentee_id')).filter(
+            mentee_range__overlap=NumericRange(user_id, user_id, '[]')
+        )
+
+    def involving(self, user):
+        # Every session of the user whatever its status, found through the
+        # mentor and mentee foreign key indexes
+        return self.filter(models.Q(mentor=user) | models.Q(mentee=user))
+
+
 class Mentorship(models.Model):
     MENTORSHIP_TYPES = [
         ('career_guidance', 'Career Guidance'),
@@ -80,10 +183,130 @@ class Mentorship(models.Model):
     # Metadata
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
+
+    objects = MentorshipQuerySet.as_manager()
+
+    # [start_date, end_date) as a range, for overlap checks and calendar
+    # queries. A session without end_date is an empty range.
+    timespan = models.GeneratedField(
+        expression=TsTzRange('start_date', Greatest('end_date', 'start_date')),
+        output_field=DateTimeRangeField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        constraints = [
+            # Nobody can be in two pending/active sessions at once, as mentor or
+            # as mentee. The GiST indexes behind these also serve the calendar.
+            ExclusionConstraint(
+                name='mentorship_mentor_no_overlap',
+                expressions=[(participant('mentor_id'), RangeOperators.OVERLAPS), ('timespan', RangeOperators.OVERLAPS)],
+                condition=models.Q(status__in=BOOKED_STATUSES),
+                violation_error_message='The mentor already has a session at this time.',
+            ),
+            ExclusionConstraint(
+                name='mentorship_mentee_no_overlap',
+                expressions=[(participant('mentee_id'), RangeOperators.OVERLAPS), ('timespan', RangeOperators.OVERLAPS)],
+                condition=models.Q(status__in=BOOKED_STATUSES),
+                violation_error_message='The mentee already has a session at this time.',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.mentor.name} -> {self.mentee.name}: {self.title}"
 
+# Sent once the transaction that created notifications has committed, with
+# notifications=[...]; opportunity/signals.py pushes them to live streams.
+notifications_created = Signal()
+
+
+class NotificationQuerySet(models.QuerySet):
+    def create_many(self, notifications, batch_size=None):
+        # Every way of creating notifications goes through here so the unread
+        # counters are bumped in the same transaction as the inserts.
+        with transaction.atomic():
+            created = self.bulk_create(notifications, batch_size=batch_size)
+            UnreadNotificationCount.objects.adjust(
+                Counter(notification.user_id for notification in created if not notification.is_read)
+            )
+            transaction.on_commit(lambda: notifications_created.send(sender=self.model, notifications=created))
+        return created
+
+    def mark_read(self):
+        # Returns how many were actually unread, only those are taken off the counters
+        # (locked first, so a concurrent mark_read can't take the same ones off again).
+        with transaction.atomic():
+            unread = list(self.select_for_update().filter(is_read=False).values_list('id', 'user_id'))
+            if not unread:
+                return 0
+            self.model.objects.filter(id__in=[pk for pk, _ in unread]).update(is_read=True)
+            deltas = Counter()
+            for _, user_id in unread:
+                deltas[user_id] -= 1
+            UnreadNotificationCount.objects.adjust(deltas)
+        return len(unread)
+
+
+class MentorProfileQuerySet(models.QuerySet):
+    def matched_for(self, mentee, tags=None):
+        # score: same department + same programme + number of the mentor's
+        # expertise tags the mentee follows, weighted as in MENTOR_MATCH_WEIGHTS.
+        # The tag overlap is one grouped subquery on the expertise through table.
+        if tags is None:
+            tags = Tag.followers.through.objects.filter(user_id=mentee.pk).values('tag_id')
+        weights = MENTOR_MATCH_WEIGHTS
+        overlap = (
+            MentorProfile.expertise.through.objects
+            .filter(mentorprofile_id=models.OuterRef('pk'), tag_id__in=tags)
+            .values('mentorprofile_id')
+            .annotate(count=models.Count('*'))
+            .values('count')
+        )
+        same_department = models.Case(
+            models.When(department=mentee.department, then=models.Value(weights['department'])),
+            default=models.Value(0.0),
+        )
+        same_programme = models.Case(
+            models.When(programme=mentee.programme, then=models.Value(weights['programme'])),
+            default=models.Value(0.0),
+        )
+        tag_overlap = Coalesce(models.Subquery(overlap), 0) * models.Value(weights['tags'])
+        return self.annotate(
+            score=models.ExpressionWrapper(same_department + same_programme + tag_overlap, output_field=models.FloatField())
+        )
+
+
+class MentorProfile(models.Model):
+    # A user who offers to mentor. department/programme are copies of the
+    # user's (kept in step by opportunity/signals.py) so the directory can
+    # filter and rank on this table alone.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='mentor_profile')
+    department = models.CharField(max_length=100, null=True, blank=True)
+    programme = models.CharField(max_length=100, null=True, blank=True)
+    expertise = models.ManyToManyField(Tag, related_name='mentors', blank=True)
+    bio = models.TextField(blank=True, default='')
+    is_available = models.BooleanField(default=True)
+
+    # Metadata
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_date = models.DateTimeField(auto_now=True)
+
+    objects = MentorProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The directory only ever lists available mentors
+            models.Index(
+                fields=['department', 'programme'],
+                condition=models.Q(is_available=True),
+                name='mentor_available_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.name} ({'available' if self.is_available else 'unavailable'})"
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('opportunity', 'New Opportunity'),
@@ -99,13 +322,145 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     
     # Relationships
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # No index of its own, notification_inbox_idx starts with user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', db_index=False)
     related_opportunity = models.ForeignKey(Opportunity, on_delete=models.CASCADE, null=True, blank=True)
     related_experience = models.ForeignKey('experience.Experience', on_delete=models.CASCADE, null=True, blank=True)
     related_mentorship = models.ForeignKey(Mentorship, on_delete=models.CASCADE, null=True, blank=True)
     
     # Metadata
     created_date = models.DateTimeField(auto_now_add=True)
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The inbox (NotificationViewSet), newest first
+            models.Index(fields=['user', '-created_date', '-id'], name='notification_inbox_idx'),
+            # The inbox with ?unread_only=true, and mark_all_read
+            models.Index(fields=['user', 'is_read', '-created_date', '-id'], name='notification_unread_idx'),
+            # What archive_notifications looks for: read and old
+            models.Index(fields=['created_date'], condition=models.Q(is_read=True), name='notification_read_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.name}: {self.title}"
+
+
+class UnreadNotificationCountQuerySet(models.QuerySet):
+    def adjust(self, deltas):
+        # {user_id: +n / -n} applied as one upsert; users are sorted so concurrent
+        # writers lock counter rows in the same order.
+        deltas = {user_id: delta for user_id, delta in sorted(deltas.items()) if delta}
+        if not deltas:
+            return
+        sql = ADJUST_UNREAD_SQL.format(counter=UnreadNotificationCount._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'users': list(deltas), 'deltas': list(deltas.values())})
+
+    def for_user(self, user):
+        return self.filter(user=user).values_list('count', flat=True).first() or 0
+
+    def reconcile(self, user_ids):
+        # Recounts unread notifications for these users and fixes the counters
+        # that drifted (e.g. notifications removed by a cascade). The counter rows
+        # are locked before counting, so increments committed meanwhile aren't lost.
+        # Returns the ids of the users whose counter was changed.
+        user_ids = sorted(user_ids)
+        sql = RECONCILE_UNREAD_SQL.format(
+            counter=UnreadNotificationCount._meta.db_table,
+            user=User._meta.db_table,
+            notification=Notification._meta.db_table,
+        )
+        with transaction.atomic():
+            list(self.select_for_update().filter(user_id__in=user_ids).values_list('user_id', flat=True))
+            with connection.cursor() as cursor:
+                cursor.execute(sql, {'users': user_ids})
+                return [row[0] for row in cursor.fetchall()]
+
+
+class UnreadNotificationCount(models.Model):
+    # Denormalized number of unread notifications per user, kept in step by
+    # Notification.objects.create_many / mark_read and NotificationViewSet.destroy.
+    # reconcile_unread_notifications repairs any drift.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_notification_count')
+    count = models.PositiveIntegerField(default=0)
+
+    objects = UnreadNotificationCountQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count}"
+
+
+class NotificationFanout(models.Model):
+    # One notification sent to a whole audience. The rows are written in chunks
+    # by opportunity/fanout.py, last_user_id records how far it got so an
+    # interrupted job picks up where it stopped.
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+    ]
+
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    related_opportunity = models.ForeignKey(Opportunity, on_delete=models.CASCADE, null=True, blank=True)
+    related_experience = models.ForeignKey('experience.Experience', on_delete=models.CASCADE, null=True, blank=True)
+    related_mentorship = models.ForeignKey(Mentorship, on_delete=models.CASCADE, null=True, blank=True)
+
+    # {"roles": [...], "departments": [...], "programmes": [...], "tags": [tag ids], "user_ids": [...]}
+    audience = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    last_user_id = models.BigIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+
+    # Metadata
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='notification_fanouts')
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_date = models.DateTimeField(auto_now=True)
+    completed_date = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
+
+
+class ArchivedNotification(models.Model):
+    # Read notifications past the retention period, moved out of the live table
+    # by archive_notifications (see opportunity/retention.py). The table is range
+    # partitioned by month on created_date (created in the migration, partitions
+    # are added as needed), so whole months can be dropped cheaply.
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    is_read = models.BooleanField(default=True)
+
+    # No foreign key constraints on a partitioned archive
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications', db_constraint=False, db_index=False)
+    related_opportunity = models.ForeignKey(Opportunity, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, db_index=False, related_name='+')
+    related_experience = models.ForeignKey('experience.Experience', on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, db_index=False, related_name='+')
+    related_mentorship = models.ForeignKey(Mentorship, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, db_index=False, related_name='+')
+
+    # Metadata
+    created_date = models.DateTimeField()
+    archived_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_date', '-id'], name='archived_notification_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.title}"
+
+
+class CalendarFeedToken(models.Model):
+    # Secret in the user's .ics feed URLs; calendar apps can't send a JWT.
+    # Rotating it (a new token) cuts off every old subscription.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='calendar_feed_token')
+    token = models.CharField(max_length=64, unique=True, default=new_feed_token)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id}: calendar feed"
@@ -0,0 +1,11 @@
+from backend.pagination import KeysetPagination
+
+
+class NotificationCursorPagination(KeysetPagination):
+    # Newest first; served by the (user, -created_date, -id) indexes on Notification
+    ordering = ('-created_date', '-id')
+
+
+class MentorCursorPagination(KeysetPagination):
+    # Best match first (score is annotated by MentorProfile.objects.matched_for)
+    ordering = ('-score', 'user_id')
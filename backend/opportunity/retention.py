@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+# Read notifications older than this many days leave the live table
+DEFAULT_RETENTION_DAYS = 90
+
+NOTIFICATION_COLUMNS = (
+    'id, title, message, notification_type, is_read, user_id, '
+    'related_opportunity_id, related_experience_id, related_mentorship_id, created_date'
+)
+
+# One batch: the oldest read notifications, locked so that they can be moved.
+# SKIP LOCKED leaves rows someone is working on for the next run.
+SELECT_BATCH_SQL = """
+    SELECT id, created_date FROM {notification}
+    WHERE is_read AND created_date < %(cutoff)s
+    ORDER BY created_date
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED
+"""
+
+# The locked rows are deleted from the live table and inserted into the
+# archive in the same statement
+MOVE_BATCH_SQL = """
+    WITH moved AS (
+        DELETE FROM {notification} WHERE id = ANY(%(ids)s)
+        RETURNING {columns}
+    )
+    INSERT INTO {archive} ({columns}, archived_date)
+    SELECT {columns}, now() FROM moved
+"""
+
+DROP_BATCH_SQL = """
+    DELETE FROM {notification} WHERE id = ANY(%(ids)s)
+"""
+
+
+def retention_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    return timezone.now() - timedelta(days=days)
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def months_before(value, months):
+    # First day of the month `months` months before value's month
+    month = month_start(value)
+    index = month.year * 12 + month.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{ArchivedNotification._meta.db_table}_{month:%Y_%m}'
+
+
+def ensure_archive_partitions(start, end):
+    # One partition per (UTC) month from start's month up to end's month
+    table = ArchivedNotification._meta.db_table
+    month = month_start(start)
+    with connection.cursor() as cursor:
+        while month <= end:
+            following = next_month(month)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {table} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, following],
+            )
+            month = following
+
+
+def archive_partitions():
+    # (name, month) of every monthly archive partition, oldest first
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s ORDER BY c.relname
+            """,
+            [ArchivedNotification._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f'{ArchivedNotification._meta.db_table}_'
+    return [
+        (name, datetime.strptime(name[len(prefix):], '%Y_%m').replace(tzinfo=dt_timezone.utc))
+        for name in names
+    ]
+
+
+def archive_batch(cutoff, batch_size, drop=False):
+    # Moves (or with drop, deletes) one batch of read notifications older than
+    # cutoff, in its own short transaction. Returns how many rows it handled.
+    # Only read notifications are touched, so the unread counters stay right.
+    # The partitions are made for the months of this very batch: a notification
+    # marked read while the archiving runs can be older than any seen before.
+    tables = {
+        'notification': Notification._meta.db_table,
+        'archive': ArchivedNotification._meta.db_table,
+        'columns': NOTIFICATION_COLUMNS,
+    }
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(SELECT_BATCH_SQL.format(**tables), {'cutoff': cutoff, 'batch_size': batch_size})
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            ids = [row[0] for row in rows]
+            if drop:
+                cursor.execute(DROP_BATCH_SQL.format(**tables), {'ids': ids})
+            else:
+                # Ordered by created_date: first and last row span the batch
+                ensure_archive_partitions(rows[0][1], rows[-1][1])
+                cursor.execute(MOVE_BATCH_SQL.format(**tables), {'ids': ids})
+            return cursor.rowcount
+
+
+def drop_archive_partitions(before):
+    # Drops archive partitions holding only months before `before`
+    dropped = []
+    with connection.cursor() as cursor:
+        for name, month in archive_partitions():
+            if next_month(month) <= before:
+                cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+    return dropped
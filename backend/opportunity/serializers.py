@@ -1,7 +1,14 @@
+from datetime import timedelta
+
 from rest_framework import serializers
-from .models import Opportunity, Mentorship, Notification
-from user.serializers import UserSerializer
+from .models import (
+    Opportunity, Mentorship, Notification, NotificationFanout, ArchivedNotification, MentorProfile, BOOKED_STATUSES,
+)
+from .fanout import AUDIENCE_FILTERS
+from user.serializers import UserSerializer, AuthorSerializer
 from company.serializers import CompanySerializer
+from tag.models import Tag
+from user.models import User
 from tag.serializers import TagSerializer
 
 class OpportunitySerializer(serializers.ModelSerializer):
@@ -12,17 +19,157 @@ class OpportunitySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Opportunity
-        fields = '__all__'
+        # saved_by would list every user who saved it (and cost a query per row)
+        exclude = ['saved_by']
+
+class OpportunityImportSerializer(serializers.ModelSerializer):
+    # One row of a bulk import (see opportunity.importer). company is a slug and
+    # tags are titles; they are resolved against the lookup maps passed in the
+    # context, so validating a row never queries the database.
+    date_formats = ['iso-8601', '%Y-%m-%d']
+
+    company = serializers.CharField(required=False, allow_blank=True)
+    tags = serializers.ListField(child=serializers.CharField(), required=False)
+    application_deadline = serializers.DateTimeField(input_formats=date_formats, required=False, allow_null=True)
+    start_date = serializers.DateTimeField(input_formats=date_formats, required=False, allow_null=True)
+    end_date = serializers.DateTimeField(input_formats=date_formats, required=False, allow_null=True)
+
+    class Meta:
+        model = Opportunity
+        fields = [
+            'title', 'description', 'opportunity_type', 'company', 'tags', 'application_deadline',
+            'start_date', 'end_date', 'location', 'is_remote', 'compensation', 'requirements',
+            'application_link', 'contact_email', 'visibility',
+        ]
+
+    def validate_company(self, value):
+        # -> company id
+        if not value:
+            return None
+        company_id = self.context['companies'].get(value.strip())
+        if company_id is None:
+            raise serializers.ValidationError(f'Unknown company "{value}".')
+        return company_id
+
+    def validate_tags(self, value):
+        # -> tag ids, titles match case-insensitively
+        tags = self.context['tags']
+        unknown = [title for title in value if title.strip().lower() not in tags]
+        if unknown:
+            raise serializers.ValidationError(f'Unknown tags: {", ".join(unknown)}.')
+        return list(dict.fromkeys(tags[title.strip().lower()] for title in value))
+
+    def validate(self, attrs):
+        if attrs.get('start_date') and attrs.get('end_date') and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': 'Must not be before start_date.'})
+        return attrs
 
 class MentorshipSerializer(serializers.ModelSerializer):
+    # Length given to sessions created without an end_date
+    default_session_length = timedelta(hours=1)
+
     mentor = UserSerializer(read_only=True)
     mentee = UserSerializer(read_only=True)
+    mentor_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(),
+        source='mentor',
+        write_only=True,
+        required=False
+    )
+    mentee_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(),
+        source='mentee',
+        write_only=True,
+        required=False
+    )
     
     class Meta:
         model = Mentorship
-        fields = '__all__'
+        exclude = ['timespan']
+
+    def validate(self, attrs):
+        instance = self.instance
+        if instance is None and 'mentee' not in attrs and 'request' in self.context:
+            # Booking a session for yourself
+            attrs['mentee'] = self.context['request'].user
+        mentor = attrs.get('mentor', getattr(instance, 'mentor', None))
+        mentee = attrs.get('mentee', getattr(instance, 'mentee', None))
+        if mentor is None or mentee is None:
+            raise serializers.ValidationError("mentor_id and mentee_id are required")
+        if mentor == mentee:
+            raise serializers.ValidationError("A user cannot mentor themselves")
+
+        start = attrs.get('start_date', getattr(instance, 'start_date', None))
+        end = attrs.get('end_date', getattr(instance, 'end_date', None))
+        if end is None:
+            end = attrs['end_date'] = start + self.default_session_length
+        if end <= start:
+            raise serializers.ValidationError({"end_date": "end_date must be after start_date"})
+
+        # Same rule as the exclusion constraints, checked here to give a useful
+        # error; the constraints still catch two requests racing each other.
+        if attrs.get('status', getattr(instance, 'status', 'pending')) in BOOKED_STATUSES:
+            clashes = Mentorship.objects.booked().overlapping(start, end)
+            if instance is not None:
+                clashes = clashes.exclude(pk=instance.pk)
+            errors = {}
+            if clashes.for_mentor(mentor.pk).exists():
+                errors['mentor_id'] = "The mentor already has a session at this time."
+            if clashes.for_mentee(mentee.pk).exists():
+                errors['mentee_id'] = "The mentee already has a session at this time."
+            if errors:
+                raise serializers.ValidationError(errors)
+        return attrs
+
+class MentorProfileSerializer(serializers.ModelSerializer):
+    user = AuthorSerializer(read_only=True)
+    expertise = TagSerializer(many=True, read_only=True)
+    expertise_ids = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=Tag.objects.all(),
+        write_only=True,
+        source='expertise',
+        required=False
+    )
+    # Only set by the directory (MentorProfile.objects.matched_for)
+    score = serializers.FloatField(read_only=True, required=False)
+
+    class Meta:
+        model = MentorProfile
+        fields = ['user', 'department', 'programme', 'expertise', 'expertise_ids', 'bio', 'is_available', 'score', 'updated_date']
+        read_only_fields = ['department', 'programme', 'updated_date']
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
+
+class ArchivedNotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedNotification
+        fields = '__all__'
+
+class NotificationFanoutSerializer(serializers.ModelSerializer):
+    audience_keys = [*AUDIENCE_FILTERS, 'tags']
+
+    class Meta:
+        model = NotificationFanout
+        fields = '__all__'
+        read_only_fields = ['status', 'last_user_id', 'created_count', 'created_by', 'completed_date']
+
+    def validate_audience(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("audience must be an object")
+        unknown = set(value) - set(self.audience_keys)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown audience keys: {', '.join(sorted(unknown))}")
+        for key, items in value.items():
+            if not isinstance(items, list):
+                raise serializers.ValidationError(f"{key} must be a list")
+            if key in ('tags', 'user_ids') and not all(isinstance(item, int) for item in items):
+                raise serializers.ValidationError(f"{key} must be a list of ids")
+        # An empty audience would mean every user, ask for it explicitly
+        if not any(value.values()):
+            raise serializers.ValidationError("audience must narrow down at least one of: " + ', '.join(self.audience_keys))
+        return value
+
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from backend.pubsub import get_broker
+
+from user.models import User
+
+from .models import MentorProfile, notifications_created
+from .serializers import NotificationSerializer
+
+
+def notification_channel(user_id):
+    return f'notifications:{user_id}'
+
+
+@receiver(notifications_created)
+def publish_notifications(sender, notifications, **kwargs):
+    # Pushed to the user's open NotificationStream connections, if any
+    broker = get_broker()
+    for notification in notifications:
+        channel = notification_channel(notification.user_id)
+        if broker.has_subscribers(channel):
+            broker.publish(channel, NotificationSerializer(notification).data)
+
+
+# User fields copied onto MentorProfile
+MENTOR_PROFILE_FIELDS = {'department', 'programme'}
+
+
+@receiver(post_save, sender=User)
+def sync_mentor_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Keep the mentor directory's copies of department/programme current.
+    # Saves of other fields only (e.g. last_login on every login) are skipped.
+    if created or (update_fields is not None and not MENTOR_PROFILE_FIELDS & set(update_fields)):
+        return
+    MentorProfile.objects.filter(user=instance).exclude(
+        department=instance.department, programme=instance.programme
+    ).update(department=instance.department, programme=instance.programme)
@@ -1,3 +1,622 @@
-from django.test import TestCase
+import asyncio
+import os
+from datetime import timedelta
+from unittest import mock
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import update_last_login
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from user.models import User
+from company.models import Company
+from tag.models import Tag, TagType
+from backend.pubsub import get_broker
+from .models import (
+    ArchivedNotification, CalendarFeedToken, MentorProfile, Mentorship, Notification, Opportunity, UnreadNotificationCount,
+)
+from .importer import import_opportunities
+from .retention import archive_batch, retention_cutoff
+from .signals import notification_channel
+
+
+class OpportunityQueryBudgetTests(APITestCase):
+    # Opportunity endpoints must cost a fixed number of queries however many
+    # opportunities (and nested users, companies, tags) they return.
+
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.company = Company.objects.create(name='Acme', slug='acme', logo='company_logos/acme.png', description='Acme')
+        tag_type = TagType.objects.create(name='Domain')
+        self.tags = [Tag.objects.create(title=f'tag-{i}', type=tag_type) for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def add_opportunities(self, count):
+        for i in range(count):
+            creator = User.objects.create(email=f'creator{Opportunity.objects.count()}@nitc.ac.in', name='PR', role='pr')
+            opportunity = Opportunity.objects.create(
+                title=f'Opportunity {i}',
+                description='Description',
+                opportunity_type='internship',
+                company=self.company,
+                created_by=creator,
+                verified_by=creator,
+                verified=True,
+            )
+            opportunity.tags.set(self.tags)
+            opportunity.saved_by.add(self.user)
+        return opportunity
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_list(self):
+        self.add_opportunities(2)
+        _, few = self.get('/api/opportunityopportunities/')
+        self.add_opportunities(8)
+        response, many = self.get('/api/opportunityopportunities/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertNotIn('saved_by', response.data['results'][0])
+        self.assertEqual(few, many)
+        # count, page, tags
+        self.assertEqual(many, 3)
+
+    def test_detail(self):
+        opportunity = self.add_opportunities(1)
+        response, queries = self.get(f'/api/opportunityopportunities/{opportunity.id}/')
+        self.assertEqual(response.data['tags'][0]['type']['name'], 'Domain')
+        # opportunity, tags
+        self.assertEqual(queries, 2)
+
+    def test_saved(self):
+        self.add_opportunities(2)
+        _, few = self.get('/api/opportunityopportunities/saved/')
+        self.add_opportunities(8)
+        response, many = self.get('/api/opportunityopportunities/saved/')
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(few, many)
+        # opportunities, tags
+        self.assertEqual(many, 2)
+
+
+class UpcomingDeadlineTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.client.force_authenticate(self.user)
+
+    def add(self, days, title='Opportunity', **kwargs):
+        deadline = timezone.now() + timedelta(days=days) if days is not None else None
+        return Opportunity.objects.create(
+            title=title, description='Description', opportunity_type=kwargs.pop('opportunity_type', 'internship'),
+            created_by=self.user, application_deadline=deadline, **kwargs,
+        )
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_open_closing_soonest_first(self):
+        later, sooner = self.add(10), self.add(1)
+        self.add(-1)
+        self.add(None)
+        self.add(2, visibility=False)
+        job = self.add(5, opportunity_type='job')
+        self.assertEqual(self.ids('/api/opportunityopportunities/upcoming/'), [sooner.pk, job.pk, later.pk])
+        # The list filters still apply
+        self.assertEqual(self.ids('/api/opportunityopportunities/upcoming/?type=job'), [job.pk])
+
+    def test_deadline_ordering_puts_missing_deadlines_last(self):
+        undated, later, past = self.add(None), self.add(3), self.add(-1)
+        self.assertEqual(self.ids('/api/opportunityopportunities/?ordering=deadline'), [past.pk, later.pk, undated.pk])
+
+
+class ExpireOpportunitiesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='pr@nitc.ac.in', name='PR', role='pr')
+
+    def add(self, days, **kwargs):
+        deadline = timezone.now() + timedelta(days=days) if days is not None else None
+        return Opportunity.objects.create(
+            title='Opportunity', description='Description', opportunity_type='internship',
+            created_by=self.user, application_deadline=deadline, **kwargs,
+        )
+
+    def expire(self, *args):
+        stdout = StringIO()
+        call_command('expire_opportunities', '--pause', '0', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_hides_past_deadlines_in_batches(self):
+        expired = [self.add(-days) for days in range(1, 6)]
+        open_ = self.add(1)
+        undated = self.add(None)
+        before = expired[0].updated_date
+
+        self.assertIn('5 expired opportunities would be hidden', self.expire('--dry-run'))
+        self.assertEqual(Opportunity.objects.filter(visibility=True).count(), 7)
+
+        self.assertIn('hid 5 expired opportunities in 3 batches', self.expire('--batch-size', '2'))
+        self.assertEqual(set(Opportunity.objects.filter(visibility=True)), {open_, undated})
+        hidden = Opportunity.objects.get(pk=expired[0].pk)
+        self.assertGreater(hidden.updated_date, before)
+
+        # Nothing left: a no-op
+        self.assertIn('hid 0 expired opportunities in 0 batches', self.expire())
+
+
+class OpportunityImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='pr@nitc.ac.in', name='PR', role='pr')
+        self.client.force_authenticate(self.user)
+
+    def csv(self, rows, tail=b''):
+        lines = [b'title,description,opportunity_type\n']
+        lines += [f'Opportunity {i},Description,internship\n'.encode() for i in range(rows)]
+        return lines + [tail] if tail else lines
+
+    def test_unreadable_part_way(self):
+        # The rows before the bad line are imported, across batches
+        report = import_opportunities(self.csv(3, b'Bad \xff,Description,internship\n'), 'csv', self.user, batch_size=2)
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(sorted(report['ids']), sorted(Opportunity.objects.values_list('id', flat=True)))
+        self.assertEqual(report['file_error'], 'The file is not UTF-8 encoded.')
+
+        upload = SimpleUploadedFile('opportunities.csv', b''.join(self.csv(2, b'Bad \xff,Description,internship\n')))
+        response = self.client.post('/api/opportunityopportunities/import/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'The file is not UTF-8 encoded.')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Opportunity.objects.count(), 5)
+
+    def test_import(self):
+        upload = SimpleUploadedFile('opportunities.csv', b''.join(self.csv(2)))
+        response = self.client.post('/api/opportunityopportunities/import/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['file_error'])
+        self.assertEqual(response.data['created'], 2)
+
+
+class NotificationInboxTests(APITestCase):
+    url = '/api/opportunitynotifications/'
+
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        other = User.objects.create(email='other@nitc.ac.in', name='Other', role='student')
+        self.notifications = Notification.objects.create_many([
+            Notification(user=user, title=f'Notification {i}', message='x', notification_type='system', is_read=i % 2 == 0)
+            for i in range(7) for user in [self.user, other]
+        ])
+        self.notifications = [n for n in self.notifications if n.user_id == self.user.pk]
+        # Ties on created_date are broken by id
+        Notification.objects.filter(pk__in=[n.pk for n in self.notifications[2:5]]).update(
+            created_date=self.notifications[2].created_date
+        )
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def expected(self, **filters):
+        return list(Notification.objects.filter(user=self.user, **filters).order_by('-created_date', '-id').values_list('id', flat=True))
+
+    def test_pages(self):
+        ids = self.walk(f'{self.url}?page_size=2')
+        self.assertEqual(ids, self.expected())
+        self.assertEqual(len(ids), 7)
+
+    def test_unread_only(self):
+        ids = self.walk(f'{self.url}?page_size=2&unread_only=true')
+        self.assertEqual(ids, self.expected(is_read=False))
+        self.assertEqual(len(ids), 3)
+
+        # Read while paging: later pages just skip it, nothing is repeated
+        response = self.client.get(f'{self.url}?page_size=1&unread_only=true')
+        first = response.data['results'][0]['id']
+        Notification.objects.filter(pk=ids[1]).mark_read()
+        self.assertEqual(self.walk(response.data['next']), [ids[2]])
+        self.assertEqual(first, ids[0])
+
+        Notification.objects.filter(user=self.user).mark_read()
+        self.assertEqual(self.client.get(f'{self.url}?unread_only=1').data['results'], [])
+
+
+class BroadcastNotificationTests(APITestCase):
+    url = '/api/opportunitynotifications/create/'
+
+    def setUp(self):
+        self.pr = User.objects.create(email='pr@nitc.ac.in', name='PR', role='pr')
+        self.cse = User.objects.create(email='cse@nitc.ac.in', name='CSE', role='student', department='CSE')
+        self.ee = User.objects.create(email='ee@nitc.ac.in', name='EE', role='student', department='EE')
+        self.inactive = User.objects.create(email='gone@nitc.ac.in', name='Gone', role='student', is_active=False)
+        self.client.force_authenticate(self.pr)
+
+    def send(self, **data):
+        return self.client.post(self.url, {'title': 'Title', 'message': 'Message', **data}, format='json')
+
+    def recipients(self):
+        return set(Notification.objects.values_list('user_id', flat=True))
+
+    def test_user_ids(self):
+        missing = self.inactive.pk + 100
+        response = self.send(user_ids=[self.cse.pk, self.ee.pk, self.ee.pk, self.inactive.pk, missing])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['skipped']), (2, 2))
+        self.assertEqual(self.recipients(), {self.cse.pk, self.ee.pk})
+        self.assertEqual(UnreadNotificationCount.objects.for_user(self.ee), 1)
+
+    def test_audience_keys_are_anded(self):
+        response = self.send(audience={'roles': ['student'], 'departments': ['CSE', 'EE'], 'user_ids': [self.ee.pk, self.pr.pk]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertNotIn('skipped', response.data)
+        self.assertEqual(self.recipients(), {self.ee.pk})
+
+    def test_user_ids_with_audience_is_rejected(self):
+        response = self.send(user_ids=[self.cse.pk], audience={'departments': ['EE']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not both', response.data['error'])
+        self.assertEqual(self.recipients(), set())
+        # An empty selector would be everyone
+        self.assertEqual(self.send(audience={'roles': []}).status_code, 400)
+
+
+class NotificationPublishTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.channel = notification_channel(self.user.pk)
+
+    def subscribe(self, loop):
+        async def subscribe():
+            return get_broker().subscribe(self.channel)
+        subscription = loop.run_until_complete(subscribe())
+        self.addCleanup(subscription.close)
+        return subscription
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create_many([Notification(user=self.user, title='Title', message='x', notification_type='system')])
+
+    def test_delivered_to_subscriber(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = self.subscribe(loop)
+        self.notify()
+        message = loop.run_until_complete(asyncio.wait_for(subscription.get(), 5))
+        self.assertEqual(message['title'], 'Title')
+
+    def test_closed_loop_drops_subscriber(self):
+        # A stream whose event loop went away without unsubscribing must not
+        # make creating notifications fail
+        loop = asyncio.new_event_loop()
+        self.subscribe(loop)
+        loop.close()
+        with self.assertLogs('backend.pubsub', 'WARNING'):
+            self.notify()
+        self.assertFalse(get_broker().has_subscribers(self.channel))
+        self.assertEqual(Notification.objects.count(), 1)
+        self.notify()
+
+
+class UnreadNotificationCountTests(APITestCase):
+    # The per-user counter must match the number of unread notifications
+    # through every way notifications are created, read and deleted.
+
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.other = User.objects.create(email='other@nitc.ac.in', name='Other', role='student')
+        self.client.force_authenticate(self.user)
+
+    def notify(self, *users):
+        Notification.objects.create_many([
+            Notification(user=user, title='Title', message='Message', notification_type='system') for user in users
+        ])
+
+    def counter(self, user=None):
+        return UnreadNotificationCount.objects.for_user(user or self.user)
+
+    def assertCounted(self, user=None):
+        user = user or self.user
+        self.assertEqual(self.counter(user), Notification.objects.filter(user=user, is_read=False).count())
+
+    def test_create_read_delete(self):
+        self.notify(self.user, self.user, self.other)
+        self.notify(self.user, self.user)
+        self.assertEqual(self.counter(), 4)
+        self.assertEqual(self.counter(self.other), 1)
+        self.assertEqual(self.client.get('/api/opportunitynotifications/unread_count/').data['unread_count'], 4)
+
+        first, second, third, fourth = Notification.objects.filter(user=self.user).order_by('id')
+        self.client.post(f'/api/opportunitynotifications/{first.id}/mark_read/')
+        # Marking it again must not count it twice
+        self.client.post(f'/api/opportunitynotifications/{first.id}/mark_read/')
+        self.assertEqual(self.counter(), 3)
+
+        # Deleting a read notification leaves the counter, an unread one lowers it
+        self.client.delete(f'/api/opportunitynotifications/{first.id}/')
+        self.assertEqual(self.counter(), 3)
+        self.client.delete(f'/api/opportunitynotifications/{second.id}/')
+        self.assertEqual(self.counter(), 2)
+        self.assertCounted()
+
+        self.client.post('/api/opportunitynotifications/mark_all_read/')
+        self.assertEqual(self.counter(), 0)
+        self.assertCounted()
+        self.assertEqual(self.counter(self.other), 1)
+
+        self.notify(self.user)
+        self.assertEqual(self.counter(), 1)
+        self.assertCounted()
+
+    def test_reconcile(self):
+        self.notify(self.user, self.user, self.other)
+        # Drift: changes that bypass the counter
+        Notification.objects.filter(user=self.user).update(is_read=True)
+        Notification.objects.filter(user=self.other).delete()
+        nobody = User.objects.create(email='nobody@nitc.ac.in', name='Nobody', role='student')
+
+        changed = UnreadNotificationCount.objects.reconcile([self.user.pk, self.other.pk, nobody.pk])
+        self.assertEqual(sorted(changed), sorted([self.user.pk, self.other.pk]))
+        self.assertEqual(self.counter(), 0)
+        self.assertEqual(self.counter(self.other), 0)
+        # No row is created for users without unread notifications
+        self.assertFalse(UnreadNotificationCount.objects.filter(user=nobody).exists())
+        # Nothing left to fix
+        self.assertEqual(UnreadNotificationCount.objects.reconcile([self.user.pk, self.other.pk]), [])
+
+        # Negative adjustments never take a counter below zero
+        UnreadNotificationCount.objects.adjust({self.user.pk: -3, nobody.pk: -1})
+        self.assertEqual(self.counter(), 0)
+        self.assertEqual(self.counter(nobody), 0)
+
+
+class ArchiveNotificationsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+
+    def notify(self, days_ago, is_read=True):
+        notification = Notification.objects.create(
+            user=self.user, title='Title', message='Message', notification_type='system', is_read=is_read
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_date=timezone.now() - timedelta(days=days_ago))
+        return notification
+
+    def test_archive(self):
+        for days_ago in [10, 100, 130, 400]:
+            self.notify(days_ago)
+        call_command('archive_notifications', batch_size=2, pause=0, stdout=open(os.devnull, 'w'))
+        self.assertEqual(ArchivedNotification.objects.count(), 3)
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_older_notification_read_while_running(self):
+        # Partitions are made per batch, so a notification from a month the run
+        # hasn't seen yet can still be archived
+        self.notify(100)
+        old = self.notify(700, is_read=False)
+        cutoff = retention_cutoff()
+        self.assertEqual(archive_batch(cutoff, 10), 1)
+        Notification.objects.filter(pk=old.pk).mark_read()
+        self.assertEqual(archive_batch(cutoff, 10), 1)
+        self.assertEqual(archive_batch(cutoff, 10), 0)
+        self.assertTrue(ArchivedNotification.objects.filter(pk=old.pk).exists())
+
+
+class MentorProfileSyncTests(APITestCase):
+    def setUp(self):
+        self.mentor = User.objects.create(email='mentor@nitc.ac.in', name='Mentor', role='other', department='CSE', programme='BTech')
+        MentorProfile.objects.create(user=self.mentor, department='CSE', programme='BTech')
+
+    def test_copies_department_and_programme(self):
+        self.mentor.department = 'EE'
+        self.mentor.save()
+        self.mentor.programme = 'MTech'
+        self.mentor.save(update_fields=['programme'])
+        profile = MentorProfile.objects.get(user=self.mentor)
+        self.assertEqual((profile.department, profile.programme), ('EE', 'MTech'))
+
+    def test_login_does_not_touch_profile(self):
+        # Only the UPDATE of last_login
+        with self.assertNumQueries(1):
+            update_last_login(None, self.mentor)
+
+
+class MentorshipBookingTests(APITestCase):
+    url = '/api/opportunitymentorships/'
+
+    def setUp(self):
+        self.mentor = User.objects.create(email='mentor@nitc.ac.in', name='Mentor', role='student')
+        self.mentee = User.objects.create(email='mentee@nitc.ac.in', name='Mentee', role='student')
+        self.other = User.objects.create(email='other@nitc.ac.in', name='Other', role='student')
+        self.start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+
+    def add(self, hours, mentor=None, mentee=None, status='pending', length=1):
+        start = self.start + timedelta(hours=hours)
+        return Mentorship.objects.create(
+            title='Session', description='x', mentorship_type='career_guidance', status=status,
+            mentor=mentor or self.mentor, mentee=mentee or self.mentee,
+            start_date=start, end_date=start + timedelta(hours=length),
+        )
+
+    def test_busy_slots(self):
+        pending, active = self.add(0), self.add(2, mentee=self.other, status='active')
+        self.add(4, status='cancelled')
+        self.add(6, status='completed')
+        # Mentee there, not mentor
+        self.add(8, mentor=self.other, mentee=self.mentor)
+        self.add(24 * 10)
+
+        self.client.force_authenticate(self.other)
+        response = self.client.get(f'{self.url}calendar/', {'mentor': self.mentor.pk, 'start': self.start.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(slot['start_date'], slot['end_date']) for slot in response.data['busy']],
+            [(pending.start_date, pending.end_date), (active.start_date, active.end_date)],
+        )
+        # Only times, nothing about the sessions themselves
+        self.assertEqual(set(response.data['busy'][0]), {'start_date', 'end_date'})
+
+        self.assertEqual(self.client.get(f'{self.url}calendar/', {'mentor': 'me'}).status_code, 400)
+        too_long = {'mentor': self.mentor.pk, 'end': (self.start + timedelta(days=100)).isoformat(), 'start': self.start.isoformat()}
+        self.assertEqual(self.client.get(f'{self.url}calendar/', too_long).status_code, 400)
+
+    def test_lost_race_is_a_validation_error(self):
+        self.add(0, mentee=self.other)
+        self.client.force_authenticate(self.mentee)
+        data = {
+            'title': 'Session', 'description': 'x', 'mentorship_type': 'career_guidance',
+            'mentor_id': self.mentor.pk, 'start_date': (self.start + timedelta(minutes=30)).isoformat(),
+        }
+        # The serializer's own check passes, as if the clash committed right after it
+        with mock.patch.object(Mentorship.objects, 'booked', return_value=Mentorship.objects.none()):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'start_date': 'The mentor or mentee already has a session at this time.'})
+        self.assertEqual(Mentorship.objects.count(), 1)
+
+        # Back to back is fine: the spans are [start, end)
+        data['start_date'] = (self.start + timedelta(hours=1)).isoformat()
+        self.assertEqual(self.client.post(self.url, data, format='json').status_code, 201)
+
+
+class CalendarFeedTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        for i in range(3):
+            Opportunity.objects.create(
+                title=f'Opportunity {i}', description='Description', opportunity_type='internship',
+                created_by=self.user, application_deadline=timezone.now() + timedelta(days=i + 1),
+            )
+        self.url = f'/api/opportunitycalendar/{CalendarFeedToken.objects.create(user=self.user).token}/deadlines.ics'
+
+    def test_calendar_client(self):
+        client = Client()
+        response = client.get(self.url, HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+
+        # Unchanged: one aggregate query, no body
+        with self.assertNumQueries(2):
+            response = client.get(self.url, HTTP_ACCEPT='text/calendar', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(client.get(self.url.replace('deadlines', 'unknown')).status_code, 404)
+
+    def test_etag_follows_feed_membership(self):
+        url = self.url.replace('deadlines', 'saved')
+        Opportunity.objects.create(
+            title='Opportunity 3', description='Description', opportunity_type='internship',
+            created_by=self.user, application_deadline=timezone.now() + timedelta(days=4),
+        )
+        Opportunity.objects.update(updated_date=timezone.now())
+        a, b, c, d = Opportunity.objects.order_by('id')
+        self.assertEqual(a.pk + d.pk, b.pk + c.pk)
+        self.user.saved_opportunities.add(a, d)
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+
+        # Same count, id sum and latest update, different rows
+        self.user.saved_opportunities.set([b, c])
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        self.user.saved_opportunities.remove(b)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        self.user.saved_opportunities.set([a, d])
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+
+    async def test_streamed_under_asgi(self):
+        response = await AsyncClient().get(self.url, headers={'Accept': 'text/calendar'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+
+
+class MigrationTestCase(TransactionTestCase):
+    # Migrates back to `before`, lets the test add rows there, then forward to `after`
+    before = after = None
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class MentorProfileMigrationTests(MigrationTestCase):
+    before = [('opportunity', '0006_notification_archive')]
+    after = [('opportunity', '0007_mentorprofile')]
+
+    def test_profiles_created_for_listed_roles(self):
+        apps = self.migrate(self.before)
+        OldUser = apps.get_model('user', 'User')
+        student = OldUser.objects.create(email='s@nitc.ac.in', name='S', role='student', department='CSE', programme='BTech')
+        pr = OldUser.objects.create(email='p@nitc.ac.in', name='P', role='pr', department='EE')
+        OldUser.objects.create(email='o@nitc.ac.in', name='O', role='other')
+
+        apps = self.migrate(self.after)
+        MentorProfile = apps.get_model('opportunity', 'MentorProfile')
+        profiles = {p.user_id: (p.department, p.programme, p.is_available) for p in MentorProfile.objects.all()}
+        self.assertEqual(profiles, {student.pk: ('CSE', 'BTech', True), pr.pk: ('EE', None, True)})
+
+
+class MentorshipTimespanMigrationTests(MigrationTestCase):
+    before = [('opportunity', '0007_mentorprofile')]
+    after = [('opportunity', '0008_mentorship_timespan')]
+
+    def test_double_bookings_cancelled(self):
+        apps = self.migrate(self.before)
+        Mentorship = apps.get_model('opportunity', 'Mentorship')
+        OldUser = apps.get_model('user', 'User')
+        mentor, mentee, other = [
+            OldUser.objects.create(email=f'{name}@nitc.ac.in', name=name, role='student')
+            for name in ['mentor', 'mentee', 'other']
+        ]
+        start = timezone.now()
+
+        def session(mentor, mentee, offset, hours=1, status='pending', end=True):
+            return Mentorship.objects.create(
+                title='Session', description='x', mentorship_type='general', status=status,
+                mentor=mentor, mentee=mentee, start_date=start + timedelta(hours=offset),
+                end_date=start + timedelta(hours=offset + hours) if end else None,
+            ).pk
+
+        kept = session(mentor, mentee, 0, hours=2)
+        clash = session(mentor, other, 1)                         # same mentor
+        no_end = session(other, mentee, 1, end=False)             # same mentee, gets a 1h end
+        touching = session(mentor, other, 2)                      # starts as kept ends
+        old_cancelled = session(mentor, mentee, 0, status='cancelled')
+
+        apps = self.migrate(self.after)
+        Mentorship = apps.get_model('opportunity', 'Mentorship')
+        statuses = dict(Mentorship.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[kept], 'pending')
+        self.assertEqual(statuses[clash], 'cancelled')
+        self.assertEqual(statuses[no_end], 'cancelled')
+        self.assertEqual(statuses[touching], 'pending')
+        self.assertEqual(statuses[old_cancelled], 'cancelled')
+        self.assertEqual(
+            Mentorship.objects.get(pk=no_end).end_date, Mentorship.objects.get(pk=no_end).start_date + timedelta(hours=1)
+        )
@@ -2,7 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     OpportunityViewSet, MentorshipViewSet, NotificationViewSet,
-    SavedOpportunitiesList, OpportunityAnalytics, CreateNotification
+    SavedOpportunitiesList, OpportunityAnalytics, CreateNotification,
+    NotificationFanoutList, NotificationFanoutDetail, NotificationStream, ArchivedNotificationList,
+    CalendarFeedTokenView, CalendarFeed
 )
 
 router = DefaultRouter()
@@ -10,9 +12,17 @@ router.register(r'opportunities', OpportunityViewSet)
 router.register(r'mentorships', MentorshipViewSet)
 router.register(r'notifications', NotificationViewSet)
 
+# Explicit paths go before the router, otherwise its detail routes
+# (opportunities/<pk>/, notifications/<pk>/) swallow them
 urlpatterns = [
-    path('', include(router.urls)),
     path('opportunities/saved/', SavedOpportunitiesList.as_view(), name='saved-opportunities'),
     path('opportunities/analytics/', OpportunityAnalytics.as_view(), name='opportunity-analytics'),
     path('notifications/create/', CreateNotification.as_view(), name='create-notification'),
+    path('notifications/stream/', NotificationStream.as_view(), name='notification-stream'),
+    path('notifications/archive/', ArchivedNotificationList.as_view(), name='archived-notifications'),
+    path('notifications/fanout/', NotificationFanoutList.as_view(), name='notification-fanout-list'),
+    path('notifications/fanout/<int:pk>/', NotificationFanoutDetail.as_view(), name='notification-fanout-detail'),
+    path('calendar/', CalendarFeedTokenView.as_view(), name='calendar-feed-token'),
+    path('calendar/<str:token>/<str:kind>.ics', CalendarFeed.as_view(), name='calendar-feed'),
+    path('', include(router.urls)),
 ]
@@ -1,14 +1,41 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.views import APIView
-from django.db.models import Q
-from .models import Opportunity, Mentorship, Notification
-from .serializers import OpportunitySerializer, MentorshipSerializer, NotificationSerializer
-from user.models import User
-from user.serializers import UserSerializer
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from backend.pubsub import get_broker
+from .fanout import fanout_now, notify_new_opportunity, start_fanout
+from .importer import ImportFileError, detect_file_type, import_opportunities
+from .pagination import MentorCursorPagination, NotificationCursorPagination
+from .models import (
+    Opportunity, Mentorship, Notification, NotificationFanout, UnreadNotificationCount, ArchivedNotification,
+    MentorProfile, CalendarFeedToken, new_feed_token,
+)
+from .ical import FEEDS, iterate_in_thread, user_feed
+from .serializers import (
+    OpportunitySerializer, MentorshipSerializer, NotificationSerializer, NotificationFanoutSerializer,
+    ArchivedNotificationSerializer, MentorProfileSerializer,
+)
+from .signals import notification_channel
+from tag.models import Tag
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 class IsAdminorSPOCorPR(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and (request.user.role=='spoc' or request.user.role=='admin' or request.user.role=='pr')
@@ -19,7 +46,7 @@ class OpportunityViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = Opportunity.objects.filter(visibility=True)
+        queryset = Opportunity.objects.with_related().filter(visibility=True)
         
         # Filter by opportunity type
         opportunity_type = self.request.query_params.get('type', None)
@@ -39,8 +66,51 @@ class OpportunityViewSet(viewsets.ModelViewSet):
                 Q(description__icontains=search)
             )
             
+        # ?ordering=deadline: closing soonest first, opportunities without a deadline last
+        if self.request.query_params.get('ordering') == 'deadline':
+            return queryset.order_by(F('application_deadline').asc(nulls_last=True), 'id')
         return queryset.order_by('-created_date')
+
+    @action(detail=False, methods=['get'])
+    def upcoming(self, request):
+        # Visible opportunities still open for applications, closing soonest first.
+        # Served by the partial index on application_deadline WHERE visibility.
+        queryset = self.get_queryset().filter(
+            application_deadline__gte=timezone.now()
+        ).order_by('application_deadline', 'id')
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
     
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        # Bulk import from an uploaded .csv/.jsonl/.json file (`file`). Rows that
+        # fail validation are reported and skipped; ?dry_run=true only validates.
+        if request.user.role not in ['pr', 'spoc', 'admin']:
+            return Response({'error': 'Insufficient permissions'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_type = detect_file_type(upload.name)
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        report = import_opportunities(
+            upload,
+            file_type,
+            created_by=request.user,
+            dry_run=request.query_params.get('dry_run', '').lower() in ['true', '1'],
+        )
+        if report['file_error']:
+            # The file broke off part way: still report what was created before
+            return Response({'error': report['file_error'], **report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def save(self, request, pk=None):
         opportunity = self.get_object()
@@ -59,9 +129,13 @@ class OpportunityViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Insufficient permissions'}, status=status.HTTP_403_FORBIDDEN)
         
         opportunity = self.get_object()
+        newly_verified = not opportunity.verified
         opportunity.verified = True
         opportunity.verified_by = request.user
         opportunity.save()
+        if newly_verified:
+            # Let everyone following its tags know
+            notify_new_opportunity(opportunity, created_by=request.user)
         return Response({'status': 'verified'})
 
 class MentorshipViewSet(viewsets.ModelViewSet):
@@ -74,47 +148,187 @@ class MentorshipViewSet(viewsets.ModelViewSet):
         return Mentorship.objects.filter(
             Q(mentor=user) | Q(mentee=user)
         ).order_by('-created_date')
+
+    def perform_create(self, serializer):
+        self.save_session(serializer)
+
+    def perform_update(self, serializer):
+        self.save_session(serializer)
+
+    def save_session(self, serializer):
+        user = self.request.user
+        if user not in (serializer.validated_data.get('mentor', getattr(serializer.instance, 'mentor', None)),
+                        serializer.validated_data.get('mentee', getattr(serializer.instance, 'mentee', None))):
+            raise PermissionDenied("You can only schedule sessions you take part in.")
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            # Lost a race with another booking for the same time
+            raise ValidationError({'start_date': 'The mentor or mentee already has a session at this time.'})
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        # Sessions overlapping [start, end) (ISO datetimes, default the next 7
+        # days, at most 92 days), cancelled ones left out. ?mentor=<id> gives
+        # that mentor's busy slots instead, from the exclusion constraint's index.
+        now = timezone.now()
+        try:
+            start = self.parse_window_bound(request.query_params.get('start')) or now
+            end = self.parse_window_bound(request.query_params.get('end')) or start + timedelta(days=7)
+        except ValueError:
+            return Response({'error': 'start and end must be ISO 8601 datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+        if end <= start or end - start > timedelta(days=92):
+            return Response({'error': 'end must be after start and within 92 days of it'}, status=status.HTTP_400_BAD_REQUEST)
+
+        mentor = request.query_params.get('mentor')
+        if mentor:
+            if not mentor.isdigit():
+                return Response({'error': 'mentor must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+            busy = Mentorship.objects.booked().overlapping(start, end).for_mentor(int(mentor)).order_by('start_date')
+            return Response({
+                'start': start,
+                'end': end,
+                'busy': list(busy.values('start_date', 'end_date')),
+            })
+
+        sessions = (
+            Mentorship.objects.involving(request.user).exclude(status='cancelled').overlapping(start, end)
+            .select_related('mentor', 'mentee').order_by('start_date')
+        )
+        return Response({
+            'start': start,
+            'end': end,
+            'results': MentorshipSerializer(sessions, many=True).data,
+        })
+
+    @staticmethod
+    def parse_window_bound(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
     
     @action(detail=False, methods=['get'])
     def available_mentors(self, request):
-        # Get users who can be mentors (seniors, alumni, etc.)
-        mentors = User.objects.filter(
-            role__in=['student', 'spoc', 'pr', 'admin']
-        ).exclude(id=request.user.id)
-        return Response(UserSerializer(mentors, many=True).data)
+        # Mentor directory: users with an available mentor profile, best match
+        # for the requesting mentee first, cursor paginated (?page_size=, max 100)
+        queryset = MentorProfile.objects.filter(is_available=True).exclude(user=request.user).select_related('user').prefetch_related(
+            Prefetch('expertise', queryset=Tag.objects.select_related('type'))
+        )
+
+        department = request.query_params.get('department')
+        if department:
+            queryset = queryset.filter(department=department)
+        programme = request.query_params.get('programme')
+        if programme:
+            queryset = queryset.filter(programme=programme)
+
+        # Mentors with any of these expertise tags (?tags=1,2)
+        tags = request.query_params.get('tags')
+        if tags:
+            try:
+                tags = [int(tag) for tag in tags.split(',')]
+            except ValueError:
+                return Response({'error': 'tags must be comma separated tag ids'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(Exists(
+                MentorProfile.expertise.through.objects.filter(mentorprofile_id=OuterRef('pk'), tag_id__in=tags)
+            ))
+
+        paginator = MentorCursorPagination()
+        page = paginator.paginate_queryset(queryset.matched_for(request.user), request)
+        serializer = MentorProfileSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get', 'put', 'patch', 'delete'])
+    def mentor_profile(self, request):
+        # The requesting user's own mentor profile; PUT/PATCH create it if needed
+        profile = MentorProfile.objects.filter(user=request.user).first()
+
+        if request.method == 'GET':
+            if profile is None:
+                return Response({'error': 'No mentor profile'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(MentorProfileSerializer(profile).data)
+
+        if request.method == 'DELETE':
+            if profile is not None:
+                profile.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = MentorProfileSerializer(profile, data=request.data, partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user, department=request.user.department, programme=request.user.programme)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if profile is None else status.HTTP_200_OK)
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    # Cursor pages: no OFFSET and no COUNT(*) however big the inbox gets
+    pagination_class = NotificationCursorPagination
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_date')
+        queryset = Notification.objects.filter(user=self.request.user).order_by('-created_date', '-id')
+
+        # Only unread notifications
+        if self.request.query_params.get('unread_only', '').lower() in ['1', 'true']:
+            queryset = queryset.filter(is_read=False)
+
+        return queryset
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        Notification.objects.filter(pk=notification.pk).mark_read()
         return Response({'status': 'marked as read'})
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        Notification.objects.filter(user=request.user).mark_read()
         return Response({'status': 'all marked as read'})
 
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        # Reads the user's counter row, never counts the notifications themselves
+        return Response({'unread_count': UnreadNotificationCount.objects.for_user(request.user)})
+
     def destroy(self, request, pk=None):
         notification = self.get_object()
-        notification.delete()
+        with transaction.atomic():
+            # Deleting only if still unread tells whether the counter has to go down,
+            # even if it is marked read concurrently
+            unread, _ = Notification.objects.filter(pk=notification.pk, is_read=False).delete()
+            if unread:
+                UnreadNotificationCount.objects.adjust({notification.user_id: -1})
+            else:
+                Notification.objects.filter(pk=notification.pk).delete()
         return Response({'status': 'deleted'})
 
 
+class ArchivedNotificationList(APIView):
+    # Old read notifications moved out of the inbox by archive_notifications,
+    # newest first, cursor paginated like the inbox
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        queryset = ArchivedNotification.objects.filter(user=request.user)
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = ArchivedNotificationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
 class SavedOpportunitiesList(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        saved_opportunities = Opportunity.objects.filter(
+        saved_opportunities = Opportunity.objects.with_related().filter(
             saved_by=request.user,
             visibility=True
         ).order_by('-created_date')
@@ -185,20 +399,214 @@ class CreateNotification(APIView):
                 'error': 'Title and message are required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        user_ids = request.data.get('user_ids')
+        audience = request.data.get('audience')
+        if user_ids is not None or audience is not None:
+            return self.broadcast(request, user_ids, audience)
+
         notification_data = {
             'title': title,
             'message': message,
             'notification_type': notification_type,
-            'user_id': user_id,
+            'user': user_id,
         }
 
         if related_opportunity_id:
-            notification_data['related_opportunity_id'] = related_opportunity_id
+            notification_data['related_opportunity'] = related_opportunity_id
         if related_experience_id:
-            notification_data['related_experience_id'] = related_experience_id
+            notification_data['related_experience'] = related_experience_id
 
         serializer = NotificationSerializer(data=notification_data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            # Through create_many so the user's unread counter goes up with it
+            notification, = Notification.objects.create_many([Notification(**serializer.validated_data)])
+            return Response(NotificationSerializer(notification).data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def broadcast(self, request, user_ids, audience):
+        # The same notification for a list of users or an audience selector
+        # (roles, departments, programmes, tags; keys are ANDed, see
+        # opportunity.fanout). Written within this request, in chunks of bulk
+        # inserts inside one transaction, so it's all or nothing; use
+        # notifications/fanout/ for very large audiences.
+        if user_ids is not None and audience is not None:
+            # Both would read as "these users and that audience" but a selector
+            # can only narrow down; ask for an intersection explicitly
+            return Response({
+                'error': 'Send either user_ids or audience, not both. To notify only the listed users '
+                         'that match the audience, put user_ids inside audience.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if user_ids is not None:
+            audience = {'user_ids': user_ids}
+
+        serializer = NotificationFanoutSerializer(data={
+            'title': request.data.get('title'),
+            'message': request.data.get('message'),
+            'notification_type': request.data.get('notification_type', 'system'),
+            'related_opportunity': request.data.get('related_opportunity_id'),
+            'related_experience': request.data.get('related_experience_id'),
+            'audience': audience,
+        })
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        job = fanout_now(**serializer.validated_data, created_by=request.user)
+        data = {'job_id': job.id, 'status': job.status, 'created': job.created_count}
+        if set(audience) == {'user_ids'}:
+            # Unknown or inactive users in the list (also when it came in audience)
+            data['skipped'] = len(set(audience['user_ids'])) - job.created_count
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class NotificationFanoutList(APIView):
+    # POST queues one notification for a whole audience (see opportunity/fanout.py),
+    # the rows are written in the background. GET lists the latest jobs.
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminorSPOCorPR]
+
+    def get(self, request):
+        jobs = NotificationFanout.objects.order_by('-created_date')[:50]
+        return Response(NotificationFanoutSerializer(jobs, many=True).data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = NotificationFanoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        job = start_fanout(**serializer.validated_data, created_by=request.user)
+        return Response(NotificationFanoutSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class NotificationFanoutDetail(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminorSPOCorPR]
+
+    def get(self, request, pk):
+        try:
+            job = NotificationFanout.objects.get(pk=pk)
+        except NotificationFanout.DoesNotExist:
+            return Response({'error': 'Fan-out job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(NotificationFanoutSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class NotificationStream(View):
+    # Server-sent events: new notifications are pushed to the user as they are
+    # created, one idle connection instead of polling the inbox. Meant to be
+    # served by the ASGI app (backend/asgi.py). EventSource can't send headers,
+    # so the access token may also be passed as ?token=. On reconnect the
+    # browser sends Last-Event-ID and whatever was missed is sent first.
+    keepalive = 25
+    replay_limit = 100
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            # Under WSGI the endless stream would be collected into one body:
+            # the worker would be held forever and the client get nothing
+            return JsonResponse(
+                {'detail': 'Notification streaming needs the ASGI server, see How_to_Run.md.'}, status=501
+            )
+        user = await self.authenticate(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(self.events(user, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def authenticate(self, request):
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else request.GET.get('token')
+        if not raw_token:
+            return None
+        try:
+            validated_token = authentication.get_validated_token(raw_token)
+            return await sync_to_async(authentication.get_user)(validated_token)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+
+    async def events(self, user, last_event_id):
+        # Subscribed before reading the missed ones, so nothing created in
+        # between is lost; anything sent twice is skipped by id.
+        subscription = get_broker().subscribe(notification_channel(user.id))
+        try:
+            yield 'retry: 5000\n\n'
+            replayed = set()
+            if last_event_id and last_event_id.isdigit():
+                for data in await self.missed(user, int(last_event_id)):
+                    replayed.add(data['id'])
+                    yield self.event(data)
+
+            while True:
+                try:
+                    data = await asyncio.wait_for(subscription.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    # Comment line, keeps proxies from closing the idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                if data['id'] not in replayed:
+                    yield self.event(data)
+        finally:
+            subscription.close()
+
+    @sync_to_async
+    def missed(self, user, last_id):
+        notifications = Notification.objects.filter(user=user, id__gt=last_id).order_by('id')[:self.replay_limit]
+        return NotificationSerializer(notifications, many=True).data
+
+    @staticmethod
+    def event(data):
+        return f'id: {data["id"]}\nevent: notification\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+class CalendarFeedTokenView(APIView):
+    # GET: the user's .ics feed URLs (creating the token on first use).
+    # POST: a new token, old feed URLs stop working.
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        feed_token, _ = CalendarFeedToken.objects.get_or_create(user=request.user)
+        return Response(self.feed_urls(request, feed_token), status=status.HTTP_200_OK)
+
+    def post(self, request):
+        feed_token, _ = CalendarFeedToken.objects.update_or_create(user=request.user, defaults={'token': new_feed_token()})
+        return Response(self.feed_urls(request, feed_token), status=status.HTTP_200_OK)
+
+    def feed_urls(self, request, feed_token):
+        return {
+            kind: request.build_absolute_uri(reverse('calendar-feed', args=[feed_token.token, kind]))
+            for kind in FEEDS
+        }
+
+
+class CalendarFeed(View):
+    # Token-authenticated .ics feeds for calendar apps. A plain Django view:
+    # calendar clients send Accept: text/calendar, which DRF's content
+    # negotiation would refuse. The body is streamed event by event (through an
+    # async iterator under ASGI); a client polling with If-None-Match gets a
+    # 304 after a single aggregate query.
+
+    def get(self, request, token, kind):
+        feed_token = CalendarFeedToken.objects.select_related('user').filter(token=token).first()
+        if feed_token is None or not feed_token.user.is_active:
+            raise Http404
+        feed = user_feed(kind, feed_token.user)
+        if feed is None:
+            raise Http404
+
+        etag = feed.etag()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        content = feed.stream(request.get_host())
+        if isinstance(request, ASGIRequest):
+            # A sync iterator would be read whole before anything is sent
+            content = iterate_in_thread(content)
+        response = StreamingHttpResponse(content, content_type='text/calendar; charset=utf-8')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Content-Disposition'] = f'inline; filename="{kind}.ics"'
+        return response
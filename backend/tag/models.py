@@ -1,5 +1,8 @@
 from django.db import models
 
+from backend.toggles import toggle_membership
+from user.models import User
+
 # Create your models here.
 
 class TagType(models.Model):
@@ -7,8 +10,20 @@ class TagType(models.Model):
     def __str__(self):
         return self.name
         
+class TagQuerySet(models.QuerySet):
+    def toggle_followed(self, tag_id, user):
+        # Follows the tag for the user, or unfollows it if it was followed, in one
+        # statement. Returns True if it is now followed, False if it was unfollowed
+        # and None if the tag does not exist.
+        return toggle_membership(Tag.followers.through, 'tag', tag_id, user)
+
 class Tag(models.Model):
     title = models.CharField(max_length=100, unique=True)
     type= models.ForeignKey(TagType,on_delete=models.SET_NULL,null=True,blank=True, related_name="tags")
+    # Users notified about new opportunities/experiences with this tag
+    followers= models.ManyToManyField(User, related_name="followed_tags", blank=True)
+
+    objects = TagQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.title}- {self.type.name if self.type else 'No Type'}" 
\ No newline at end of file
@@ -18,4 +18,4 @@ class TagSerializer(serializers.ModelSerializer):
     type = TagTypeSerializer(read_only=True)
     class Meta:
         model=Tag
-        fields='__all__'
\ No newline at end of file
+        exclude=['followers']
\ No newline at end of file
@@ -1,3 +1,25 @@
-from django.test import TestCase
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from user.models import User
+from .models import Tag
+
+
+class FollowTagTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='student@nitc.ac.in', name='Student', role='student')
+        self.tag = Tag.objects.create(title='python')
+        self.client.force_authenticate(self.user)
+
+    def test_follow_and_unfollow(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(f'/api/tag/{self.tag.id}/follow')
+        self.assertTrue(response.data['is_following'])
+        self.assertTrue(self.tag.followers.filter(pk=self.user.pk).exists())
+
+        response = self.client.post(f'/api/tag/{self.tag.id}/follow')
+        self.assertFalse(response.data['is_following'])
+        self.assertFalse(self.tag.followers.exists())
+
+    def test_missing_tag(self):
+        response = self.client.post(f'/api/tag/{self.tag.id + 1}/follow')
+        self.assertEqual(response.status_code, 404)
@@ -4,6 +4,7 @@ from .views import *
 urlpatterns=[
     path('',ListCreateTag.as_view(),name='tag-list-create'),
     path('/<int:pk>',TagDetail.as_view(),name='tag-detail'),
+    path('/<int:pk>/follow', FollowUnfollowTag.as_view(), name='tag-follow'),
     path('/type',ListCreateTagType.as_view(),name='tagtype-list-create'),
     path('/type/<int:pk>',TagTypeDetail.as_view(),name='tagtype-detail'),
     path('/type/<int:pk>/tags', TagsByTagType.as_view(), name='tags-by-type'),
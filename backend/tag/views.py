@@ -101,3 +101,16 @@ class TagSearch(APIView):
         
         serializer = TagSerializer(tags, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class FollowUnfollowTag(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        following = Tag.objects.toggle_followed(pk, request.user)
+        if following is None:
+            return Response({"detail": "Tag not found."}, status=status.HTTP_404_NOT_FOUND)
+        if following:
+            return Response({"message": "Tag followed", "is_following": True}, status=status.HTTP_200_OK)
+        return Response({"message": "Tag unfollowed", "is_following": False}, status=status.HTTP_200_OK)